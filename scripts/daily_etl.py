@@ -5,16 +5,126 @@ Runs daily to process previous day's data
 """
 import os
 import sys
+import glob
 import yaml
 import duckdb
 import logging
+import threading
+import pyarrow as pa
+import pyarrow.compute as pc
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
 from datetime import datetime, timedelta
 from pathlib import Path
 
+# Prefer PyYAML's libyaml-backed loader; the pure-Python one is much slower
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from utils import get_parquet_files, generate_union_sql_from_parquet
+from utils import get_parquet_files
+from utils.schema import DEX_RAW_DDL
+
+
+# Copy newly seen parquet files into dex_raw (DuckDB native storage), so
+# each file is decoded once and later runs scan dex_raw instead of parquet.
+# source_file records which files have already been ingested.
+RAW_INGEST_SQL = """
+INSERT INTO dex_raw (chain_id, date, hour, orderId, inputToken, outputToken, request, source_file)
+SELECT $chain_id, date, hour, orderId, inputToken, outputToken, request, filename
+FROM read_parquet($parquet_files, union_by_name = true, filename = true)
+"""
+
+# Hourly, daily and total aggregation over one chain's dex_raw rows for the
+# date range in a single scan.
+# gid = GROUPING_ID(date, hour): 0 = hourly, 1 = daily, 3 = total
+# orderId is only used for distinct counting, so it is reduced to a 64-bit
+# hash (NULL stays NULL so it is still ignored by COUNT(DISTINCT)).
+# request is parsed once per row with a fixed schema via json_transform and
+# flattened with UNNEST; dex_final is MATERIALIZED so the unnesting is
+# computed once and not inlined into each grouping set.
+# Percentages are added afterwards by add_percentage.
+DEX_USAGE_SQL = """
+WITH dex_parsed AS (
+    SELECT
+        date,
+        hour,
+        CASE WHEN orderId IS NOT NULL THEN hash(orderId) END as order_hash,
+        json_transform(request, '{"swapInfo":{"routePlans":[{"subRouters":[{"dexes":[{"dex":"VARCHAR","weight":"INTEGER"}]}]}]}}') as parsed
+    FROM dex_raw
+    WHERE chain_id = $chain_id
+    AND date BETWEEN CAST($begin_time AS DATE) AND CAST($end_time AS DATE)
+    AND request IS NOT NULL
+    AND inputToken NOT IN $excluded_tokens
+    AND outputToken NOT IN $excluded_tokens
+),
+dex_flattened AS (
+    SELECT
+        date,
+        hour,
+        order_hash,
+        UNNEST(parsed.swapInfo.routePlans).subRouters as sub_routers
+    FROM dex_parsed
+),
+dex_details AS (
+    SELECT
+        date,
+        hour,
+        order_hash,
+        UNNEST(sub_routers).dexes as dexes
+    FROM dex_flattened
+),
+dex_unnested AS (
+    SELECT
+        date,
+        hour,
+        order_hash,
+        UNNEST(dexes) as dex
+    FROM dex_details
+),
+dex_final AS MATERIALIZED (
+    SELECT
+        date,
+        hour,
+        order_hash,
+        dex.dex as dex_name,
+        dex.weight as weight
+    FROM dex_unnested
+    WHERE dex.dex IS NOT NULL
+)
+SELECT
+    GROUPING_ID(date, hour) as gid,
+    $chain_id as chain_id,
+    CAST(date AS DATE) as date,
+    hour,
+    dex_name,
+    COUNT(*) as usage_count,
+    SUM(weight) as total_weight,
+    COUNT(DISTINCT order_hash) as unique_orders
+FROM dex_final
+GROUP BY GROUPING SETS ((date, hour, dex_name), (date, dex_name), (dex_name))
+ORDER BY gid, date, hour, usage_count DESC
+"""
+
+# Columns kept for each grouping set
+HOURLY_COLUMNS = ['chain_id', 'date', 'hour', 'dex_name', 'usage_count', 'total_weight', 'unique_orders']
+DAILY_COLUMNS = ['chain_id', 'date', 'dex_name', 'usage_count', 'total_weight', 'unique_orders', 'percentage']
+TOTAL_COLUMNS = ['chain_id', 'dex_name', 'usage_count', 'total_weight', 'unique_orders', 'percentage']
+
+# DuckDB settings applied after connecting; config['duckdb'] overrides these.
+# None leaves DuckDB's own default in place.
+DUCKDB_SETTINGS = {
+    'threads': None,                    # default: all cores
+    'memory_limit': None,               # e.g. '8GB'; default: 80% of RAM
+    'preserve_insertion_order': False,  # every result we read is explicitly ordered
+    'parquet_metadata_cache': True,     # reuse footers across repeated scans
+}
 
 
 def setup_logging(config):
@@ -33,6 +143,28 @@ def setup_logging(config):
     return logging.getLogger(__name__)
 
 
+def configure_connection(conn, settings=None):
+    """
+    Apply DuckDB settings to a connection
+
+    Args:
+        conn: DuckDB connection
+        settings: Optional dict overriding DUCKDB_SETTINGS
+    """
+    logger = logging.getLogger(__name__)
+
+    merged = {**DUCKDB_SETTINGS, **(settings or {})}
+    for name, value in merged.items():
+        if name not in DUCKDB_SETTINGS:
+            logger.warning(f"Ignoring unknown duckdb setting: {name}")
+            continue
+        if value is None:
+            continue
+        # Setting names can't be bound, hence the whitelist above
+        conn.execute(f"SET {name} = ?", [value])
+        logger.info(f"DuckDB setting {name} = {value}")
+
+
 def get_date_range(days_back=1):
     """
     Get date range for ETL (previous day by default)
@@ -41,353 +173,255 @@ def get_date_range(days_back=1):
         days_back: Number of days back to process (1 = yesterday)
 
     Returns:
-        Tuple of (begin_time, end_time) as strings
+        Tuple of (begin_time, end_time) as midnight datetimes
     """
     end_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    begin_date = end_date - timedelta(days=days_back)
-    end_date = begin_date + timedelta(days=1)
-
-    begin_time = begin_date.strftime("%Y-%m-%d %H:%M:%S")
-    end_time = end_date.strftime("%Y-%m-%d %H:%M:%S")
+    begin_time = end_date - timedelta(days=days_back)
+    end_time = begin_time + timedelta(days=1)
 
     return begin_time, end_time
 
 
-def extract_dex_usage(conn, chain_id, begin_time, end_time, excluded_tokens):
+def add_percentage(table, partition_by=None):
     """
-    Extract DEX usage data from parquet files
+    Add a percentage column with each row's share of usage_count
+
+    Args:
+        table: Arrow table with a usage_count column
+        partition_by: Optional column to compute shares within (e.g. 'date')
+
+    Returns:
+        Arrow table with a percentage column rounded to 2 decimals
+    """
+    if partition_by:
+        totals = table.group_by(partition_by).aggregate([('usage_count', 'sum')])
+        table = table.join(totals, partition_by)
+        total_usage = table['usage_count_sum']
+    else:
+        total_usage = pc.sum(table['usage_count'])
+
+    share = pc.divide(pc.multiply(pc.cast(table['usage_count'], pa.float64()), 100.0), total_usage)
+    percentage = pc.round(share, ndigits=2, round_mode='half_towards_infinity')
+    return table.append_column('percentage', percentage)
+
+
+@lru_cache(maxsize=None)
+def expand_file_pattern(pattern):
+    """
+    Expand a parquet glob pattern, cached for the life of the process
+
+    Adjacent days share a boundary pattern, so init mode would otherwise
+    walk the same partition directories twice per chain.
+
+    Args:
+        pattern: Glob pattern from get_parquet_files
+
+    Returns:
+        Tuple of matching file paths
+    """
+    return tuple(glob.glob(pattern))
+
+
+def ingest_parquet_files(conn, chain_id, file_patterns):
+    """
+    Copy parquet files that have not been ingested yet into dex_raw
 
     Args:
         conn: DuckDB connection
         chain_id: Chain identifier
-        begin_time: Start time
-        end_time: End time
-        excluded_tokens: List of tokens to exclude
+        file_patterns: List of parquet file glob patterns
 
     Returns:
-        Tuple of (hourly_df, daily_df, total_df)
+        Number of newly ingested files
     """
     logger = logging.getLogger(__name__)
-    logger.info(f"Processing chain={chain_id} from {begin_time} to {end_time}")
 
-    # Get parquet files
-    try:
-        parquet_files = get_parquet_files(chain_id, begin_time, end_time)
-        if not parquet_files:
-            logger.warning(f"No parquet files found for {chain_id}")
-            return None, None, None
+    files = sorted(path for pattern in file_patterns for path in expand_file_pattern(pattern))
+    ingested = {
+        row[0] for row in conn.execute(
+            "SELECT DISTINCT source_file FROM dex_raw WHERE chain_id = ?", [chain_id]
+        ).fetchall()
+    }
+    new_files = [path for path in files if path not in ingested]
 
-        logger.info(f"Found {len(parquet_files)} parquet file patterns")
+    if new_files:
+        conn.execute(RAW_INGEST_SQL, {'chain_id': chain_id, 'parquet_files': new_files})
 
-        # Generate union SQL
-        union_sql = generate_union_sql_from_parquet(parquet_files)
+    logger.info(f"Ingested {len(new_files)} new parquet file(s) into dex_raw "
+                f"({len(files) - len(new_files)} already loaded)")
+    return len(new_files)
 
-        # Create temporary view
-        conn.execute(f"DROP VIEW IF EXISTS temp_dex_data")
-        conn.execute(f"CREATE VIEW temp_dex_data AS {union_sql}")
 
-    except Exception as e:
-        logger.error(f"Error loading parquet files: {e}")
-        return None, None, None
-
-    # Build exclusion filter
-    exclusion_filter = " AND ".join([
-        f"inputToken != '{token}' AND outputToken != '{token}'"
-        for token in excluded_tokens
-    ])
-
-    # Extract hourly data
-    logger.info("Extracting hourly data...")
-    hourly_query = f"""
-    WITH dex_extracted AS (
-        SELECT
-            date,
-            hour,
-            orderId,
-            JSON_EXTRACT(request, '$.swapInfo.routePlans') as route_plans
-        FROM temp_dex_data
-        WHERE request IS NOT NULL
-        AND {exclusion_filter}
-    ),
-    dex_flattened AS (
-        SELECT
-            date,
-            hour,
-            orderId,
-            JSON_EXTRACT(route_plan.value, '$.subRouters') as sub_routers
-        FROM dex_extracted,
-        JSON_EACH(route_plans) as route_plan
-    ),
-    dex_details AS (
-        SELECT
-            date,
-            hour,
-            orderId,
-            JSON_EXTRACT(sub_router.value, '$.dexes') as dexes
-        FROM dex_flattened,
-        JSON_EACH(sub_routers) as sub_router
-    ),
-    dex_final AS (
-        SELECT
-            date,
-            hour,
-            orderId,
-            JSON_EXTRACT(dex.value, '$.dex') as dex_name,
-            CAST(JSON_EXTRACT(dex.value, '$.weight') AS INTEGER) as weight
-        FROM dex_details,
-        JSON_EACH(dexes) as dex
-        WHERE JSON_EXTRACT(dex.value, '$.dex') IS NOT NULL
-    )
-    SELECT
-        '{chain_id}' as chain_id,
-        CAST(date AS DATE) as date,
-        hour,
-        REPLACE(dex_name, '"', '') as dex_name,
-        COUNT(*) as usage_count,
-        SUM(weight) as total_weight,
-        COUNT(DISTINCT orderId) as unique_orders
-    FROM dex_final
-    GROUP BY date, hour, dex_name
-    ORDER BY date, hour, usage_count DESC
+def extract_dex_usage(conn, chain_id, begin_time, end_time, excluded_tokens, ingest_lock=None):
     """
+    Extract DEX usage data from parquet files (via dex_raw)
 
-    try:
-        hourly_df = conn.execute(hourly_query).df()
-        logger.info(f"Extracted {len(hourly_df)} hourly records")
-    except Exception as e:
-        logger.error(f"Error extracting hourly data: {e}")
-        hourly_df = None
-
-    # Extract daily data
-    logger.info("Extracting daily data...")
-    daily_query = f"""
-    WITH dex_extracted AS (
-        SELECT
-            date,
-            orderId,
-            JSON_EXTRACT(request, '$.swapInfo.routePlans') as route_plans
-        FROM temp_dex_data
-        WHERE request IS NOT NULL
-        AND {exclusion_filter}
-    ),
-    dex_flattened AS (
-        SELECT
-            date,
-            orderId,
-            JSON_EXTRACT(route_plan.value, '$.subRouters') as sub_routers
-        FROM dex_extracted,
-        JSON_EACH(route_plans) as route_plan
-    ),
-    dex_details AS (
-        SELECT
-            date,
-            orderId,
-            JSON_EXTRACT(sub_router.value, '$.dexes') as dexes
-        FROM dex_flattened,
-        JSON_EACH(sub_routers) as sub_router
-    ),
-    dex_final AS (
-        SELECT
-            date,
-            orderId,
-            JSON_EXTRACT(dex.value, '$.dex') as dex_name,
-            CAST(JSON_EXTRACT(dex.value, '$.weight') AS INTEGER) as weight
-        FROM dex_details,
-        JSON_EACH(dexes) as dex
-        WHERE JSON_EXTRACT(dex.value, '$.dex') IS NOT NULL
-    ),
-    daily_stats AS (
-        SELECT
-            CAST(date AS DATE) as date,
-            REPLACE(dex_name, '"', '') as dex_name,
-            COUNT(*) as usage_count,
-            SUM(weight) as total_weight,
-            COUNT(DISTINCT orderId) as unique_orders
-        FROM dex_final
-        GROUP BY date, dex_name
-    )
-    SELECT
-        '{chain_id}' as chain_id,
-        date,
-        dex_name,
-        usage_count,
-        total_weight,
-        unique_orders,
-        ROUND(CAST(usage_count AS DECIMAL) * 100.0 / SUM(usage_count) OVER(PARTITION BY date), 2) as percentage
-    FROM daily_stats
-    ORDER BY date, usage_count DESC
-    """
+    Args:
+        conn: DuckDB connection
+        chain_id: Chain identifier
+        begin_time: Start time
+        end_time: End time
+        excluded_tokens: List of tokens to exclude (bound as a list parameter)
+        ingest_lock: Optional lock held while ingesting, so concurrent days of
+            the same chain don't copy a shared boundary file twice
 
-    try:
-        daily_df = conn.execute(daily_query).df()
-        logger.info(f"Extracted {len(daily_df)} daily records")
-    except Exception as e:
-        logger.error(f"Error extracting daily data: {e}")
-        daily_df = None
-
-    # Extract total data
-    logger.info("Extracting total data...")
-    total_query = f"""
-    WITH dex_extracted AS (
-        SELECT
-            orderId,
-            JSON_EXTRACT(request, '$.swapInfo.routePlans') as route_plans
-        FROM temp_dex_data
-        WHERE request IS NOT NULL
-        AND {exclusion_filter}
-    ),
-    dex_flattened AS (
-        SELECT
-            orderId,
-            JSON_EXTRACT(route_plan.value, '$.subRouters') as sub_routers
-        FROM dex_extracted,
-        JSON_EACH(route_plans) as route_plan
-    ),
-    dex_details AS (
-        SELECT
-            orderId,
-            JSON_EXTRACT(sub_router.value, '$.dexes') as dexes
-        FROM dex_flattened,
-        JSON_EACH(sub_routers) as sub_router
-    ),
-    dex_final AS (
-        SELECT
-            orderId,
-            JSON_EXTRACT(dex.value, '$.dex') as dex_name,
-            CAST(JSON_EXTRACT(dex.value, '$.weight') AS INTEGER) as weight
-        FROM dex_details,
-        JSON_EACH(dexes) as dex
-        WHERE JSON_EXTRACT(dex.value, '$.dex') IS NOT NULL
-    )
-    SELECT
-        '{chain_id}' as chain_id,
-        REPLACE(dex_name, '"', '') as dex_name,
-        COUNT(*) as usage_count,
-        SUM(weight) as total_weight,
-        COUNT(DISTINCT orderId) as unique_orders,
-        ROUND(CAST(COUNT(*) AS DECIMAL) * 100.0 / SUM(COUNT(*)) OVER(), 2) as percentage
-    FROM dex_final
-    GROUP BY dex_name
-    ORDER BY usage_count DESC
+    Returns:
+        Tuple of (hourly_table, daily_table, total_table)
     """
+    logger = logging.getLogger(__name__)
+    logger.info(f"Processing chain={chain_id} from {begin_time} to {end_time}")
 
-    try:
-        total_df = conn.execute(total_query).df()
-        logger.info(f"Extracted {len(total_df)} total records")
-    except Exception as e:
-        logger.error(f"Error extracting total data: {e}")
-        total_df = None
+    # Get parquet files. Ingest and query errors propagate, so the run is
+    # recorded as failed rather than as a day without data
+    parquet_files = get_parquet_files(chain_id, begin_time, end_time)
+    if not parquet_files:
+        logger.warning(f"No parquet files found for {chain_id}")
+        return None, None, None
+
+    logger.info(f"Found {len(parquet_files)} parquet file patterns")
 
-    # Cleanup
-    conn.execute("DROP VIEW IF EXISTS temp_dex_data")
+    # Copy files not ingested by an earlier run into dex_raw
+    with ingest_lock or nullcontext():
+        ingest_parquet_files(conn, chain_id, parquet_files)
 
-    return hourly_df, daily_df, total_df
+    # Extract hourly, daily and total data in one pass
+    logger.info("Extracting hourly/daily/total data...")
+    # Fetched as Arrow: load_data scans these tables straight back into
+    # DuckDB, so there's no need for a pandas copy in between
+    usage_table = conn.execute(DEX_USAGE_SQL, {
+        'chain_id': chain_id,
+        'begin_time': begin_time,
+        'end_time': end_time,
+        'excluded_tokens': excluded_tokens,
+    }).fetch_arrow_table()
 
+    gid = usage_table['gid']
+    hourly_table = usage_table.filter(pc.equal(gid, 0)).select(HOURLY_COLUMNS)
+    daily_table = add_percentage(usage_table.filter(pc.equal(gid, 1)), 'date').select(DAILY_COLUMNS)
+    total_table = add_percentage(usage_table.filter(pc.equal(gid, 3))).select(TOTAL_COLUMNS)
 
-def load_data(conn, hourly_df, daily_df, total_df, run_date):
+    logger.info(f"Extracted {len(hourly_table)} hourly records")
+    logger.info(f"Extracted {len(daily_table)} daily records")
+    logger.info(f"Extracted {len(total_table)} total records")
+
+    return hourly_table, daily_table, total_table
+
+
+def load_data(conn, hourly_table, daily_table, total_table, run_date):
     """
     Load extracted data into DuckDB tables
 
     Args:
         conn: DuckDB connection
-        hourly_df: Hourly statistics DataFrame
-        daily_df: Daily statistics DataFrame
-        total_df: Total statistics DataFrame
+        hourly_table: Hourly statistics Arrow table
+        daily_table: Daily statistics Arrow table
+        total_table: Total statistics Arrow table
         run_date: Date being processed
     """
     logger = logging.getLogger(__name__)
 
-    # Load hourly data
-    if hourly_df is not None and len(hourly_df) > 0:
-        logger.info(f"Loading {len(hourly_df)} hourly records...")
-        # Delete existing data for this chain and date
-        chain_id = hourly_df['chain_id'].iloc[0]
-        conn.execute(f"""
-            DELETE FROM dex_usage_hourly
-            WHERE chain_id = '{chain_id}' AND date = '{run_date}'
-        """)
-        # Insert new data (specify columns to exclude created_at)
-        conn.execute("""
-            INSERT INTO dex_usage_hourly (chain_id, date, hour, dex_name, usage_count, total_weight, unique_orders)
-            SELECT chain_id, date, hour, dex_name, usage_count, total_weight, unique_orders FROM hourly_df
-        """)
-        logger.info("✓ Loaded hourly data")
-
-    # Load daily data
-    if daily_df is not None and len(daily_df) > 0:
-        logger.info(f"Loading {len(daily_df)} daily records...")
-        chain_id = daily_df['chain_id'].iloc[0]
-        conn.execute(f"""
-            DELETE FROM dex_usage_daily
-            WHERE chain_id = '{chain_id}' AND date = '{run_date}'
-        """)
-        # Insert new data (specify columns to exclude created_at)
-        conn.execute("""
-            INSERT INTO dex_usage_daily (chain_id, date, dex_name, usage_count, total_weight, unique_orders, percentage)
-            SELECT chain_id, date, dex_name, usage_count, total_weight, unique_orders, percentage FROM daily_df
-        """)
-        logger.info("✓ Loaded daily data")
-
-    # Update total data (upsert)
-    if total_df is not None and len(total_df) > 0:
-        logger.info(f"Updating {len(total_df)} total records...")
-        chain_id = total_df['chain_id'].iloc[0]
-
-        for _, row in total_df.iterrows():
-            # Check if record exists
-            existing = conn.execute(f"""
-                SELECT usage_count, first_seen
-                FROM dex_usage_total
-                WHERE chain_id = '{row['chain_id']}' AND dex_name = '{row['dex_name']}'
-            """).fetchone()
-
-            if existing:
-                # Update existing record
-                new_count = existing[0] + row['usage_count']
-                conn.execute(f"""
-                    UPDATE dex_usage_total
-                    SET usage_count = {new_count},
-                        total_weight = total_weight + {row['total_weight']},
-                        unique_orders = unique_orders + {row['unique_orders']},
-                        last_updated = CURRENT_TIMESTAMP
-                    WHERE chain_id = '{row['chain_id']}' AND dex_name = '{row['dex_name']}'
-                """)
-            else:
-                # Insert new record
-                conn.execute(f"""
-                    INSERT INTO dex_usage_total
-                    (chain_id, dex_name, usage_count, total_weight, unique_orders, percentage, first_seen)
-                    VALUES ('{row['chain_id']}', '{row['dex_name']}', {row['usage_count']},
-                            {row['total_weight']}, {row['unique_orders']}, {row['percentage']}, '{run_date}')
-                """)
-
-        # Recalculate percentages for this chain
-        conn.execute(f"""
-            UPDATE dex_usage_total t
-            SET percentage = ROUND(CAST(t.usage_count AS DECIMAL) * 100.0 / total.sum, 2)
-            FROM (
-                SELECT SUM(usage_count) as sum
-                FROM dex_usage_total
-                WHERE chain_id = '{chain_id}'
-            ) total
-            WHERE t.chain_id = '{chain_id}'
-        """)
-
-        logger.info("✓ Updated total data")
+    # Every DELETE and insert for the chain commits together: one WAL flush
+    # per load, and a failure can't leave a day half replaced
+    conn.begin()
+    try:
+        # Load hourly data
+        if hourly_table is not None and len(hourly_table) > 0:
+            logger.info(f"Loading {len(hourly_table)} hourly records...")
+            # Delete existing data for this chain and date
+            chain_id = hourly_table['chain_id'][0].as_py()
+            conn.execute("""
+                DELETE FROM dex_usage_hourly
+                WHERE chain_id = ? AND date = ?
+            """, [chain_id, run_date])
+            # Insert new data (BY NAME also fits databases that still have created_at)
+            conn.execute("INSERT INTO dex_usage_hourly BY NAME SELECT * FROM hourly_table")
+            logger.info("✓ Loaded hourly data")
+
+        # Load daily data
+        if daily_table is not None and len(daily_table) > 0:
+            logger.info(f"Loading {len(daily_table)} daily records...")
+            chain_id = daily_table['chain_id'][0].as_py()
+            conn.execute("""
+                DELETE FROM dex_usage_daily
+                WHERE chain_id = ? AND date = ?
+            """, [chain_id, run_date])
+            # Insert new data (BY NAME also fits databases that still have created_at)
+            conn.execute("INSERT INTO dex_usage_daily BY NAME SELECT * FROM daily_table")
+            logger.info("✓ Loaded daily data")
+
+        # Update total data (upsert)
+        if total_table is not None and len(total_table) > 0:
+            logger.info(f"Updating {len(total_table)} total records...")
+            chain_id = total_table['chain_id'][0].as_py()
+
+            # Insert new DEXes and accumulate counts for existing ones in one statement
+            # (CURRENT_TIMESTAMP is bound as a column name inside DO UPDATE SET)
+            conn.execute("""
+                INSERT INTO dex_usage_total
+                (chain_id, dex_name, usage_count, total_weight, unique_orders, percentage, first_seen)
+                SELECT chain_id, dex_name, usage_count, total_weight, unique_orders, percentage, ?
+                FROM total_table
+                ON CONFLICT (chain_id, dex_name) DO UPDATE SET
+                    usage_count = dex_usage_total.usage_count + excluded.usage_count,
+                    total_weight = dex_usage_total.total_weight + excluded.total_weight,
+                    unique_orders = dex_usage_total.unique_orders + excluded.unique_orders,
+                    last_updated = get_current_timestamp()
+            """, [run_date])
+
+            # Recalculate percentages for this chain
+            conn.execute("""
+                UPDATE dex_usage_total t
+                SET percentage = ROUND(CAST(t.usage_count AS DECIMAL) * 100.0 / total.sum, 2)
+                FROM (
+                    SELECT SUM(usage_count) as sum
+                    FROM dex_usage_total
+                    WHERE chain_id = $chain_id
+                ) total
+                WHERE t.chain_id = $chain_id
+            """, {'chain_id': chain_id})
+
+            logger.info("✓ Updated total data")
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def prune_dex_raw(conn, retention_days):
+    """
+    Delete dex_raw rows older than the retention window
+
+    Pruned files are ingested again if an older day is ever re-processed.
+
+    Args:
+        conn: DuckDB connection
+        retention_days: Days of raw rows to keep; None keeps everything
+
+    Returns:
+        Number of rows deleted
+    """
+    if retention_days is None:
+        return 0
+
+    # Same UTC day boundary as the days being processed
+    cutoff = get_date_range(days_back=retention_days)[0].date()
+    deleted = conn.execute("DELETE FROM dex_raw WHERE date < ?", [cutoff]).fetchone()[0]
+    logging.getLogger(__name__).info(f"Pruned {deleted} dex_raw rows before {cutoff}")
+    return deleted
 
 
 def log_etl_run(conn, chain_id, run_date, status, records_processed=0, error_message=None):
     """Log ETL run information"""
     logger = logging.getLogger(__name__)
 
-    run_id = conn.execute("SELECT nextval('etl_run_log_seq')").fetchone()[0]
-
-    conn.execute(f"""
+    # Allocate the run_id and insert in one statement; values are bound so
+    # error messages containing quotes can't break the SQL
+    run_id = conn.execute("""
         INSERT INTO etl_run_log
         (run_id, chain_id, run_date, start_time, end_time, status, records_processed, error_message)
-        VALUES ({run_id}, '{chain_id}', '{run_date}', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP,
-                '{status}', {records_processed}, {'NULL' if error_message is None else f"'{error_message}'"})
-    """)
+        VALUES (nextval('etl_run_log_seq'), ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP, ?, ?, ?)
+        RETURNING run_id
+    """, [chain_id, run_date, status, records_processed, error_message]).fetchone()[0]
 
     logger.info(f"Logged ETL run: run_id={run_id}, status={status}")
 
@@ -406,43 +440,104 @@ def process_single_day(conn, chains, excluded_tokens, days_back, logger):
     Returns:
         Total records processed
     """
-    begin_time, end_time = get_date_range(days_back=days_back)
-    run_date = datetime.strptime(begin_time, "%Y-%m-%d %H:%M:%S").date()
+    return process_days(conn, chains, excluded_tokens, [days_back], logger)
 
-    logger.info(f"\n{'=' * 60}")
-    logger.info(f"Processing date: {run_date} (days_back={days_back})")
-    logger.info(f"Time range: {begin_time} to {end_time}")
-    logger.info(f"{'=' * 60}")
 
-    total_records = 0
+def _extract_with_cursor(conn, *args):
+    """Run extract_dex_usage on a cursor of its own, closed once it's done"""
+    cursor = conn.cursor()
+    try:
+        return extract_dex_usage(cursor, *args)
+    finally:
+        cursor.close()
 
-    for chain_id in chains:
-        logger.info(f"\n  Processing chain: {chain_id}")
 
-        try:
-            # Extract data
-            hourly_df, daily_df, total_df = extract_dex_usage(
-                conn, chain_id, begin_time, end_time, excluded_tokens
-            )
+def process_days(conn, chains, excluded_tokens, days_back_list, logger):
+    """
+    Process several days' data for all chains
 
-            # Load data
-            if hourly_df is not None or daily_df is not None or total_df is not None:
-                load_data(conn, hourly_df, daily_df, total_df, run_date)
+    Extraction for the (day, chain) pairs runs concurrently; each result is
+    loaded as soon as it is next in order, day by day in the given order, so
+    results match running process_single_day once per day.
 
-                records = (len(hourly_df) if hourly_df is not None else 0) + \
-                         (len(daily_df) if daily_df is not None else 0)
-                total_records += records
+    Args:
+        conn: DuckDB connection
+        chains: List of chain IDs
+        excluded_tokens: List of tokens to exclude
+        days_back_list: Days back from today, in the order they should be loaded
+        logger: Logger instance
 
-                # Log success
-                log_etl_run(conn, chain_id, run_date, 'success', records)
-                logger.info(f"  ✅ Successfully processed {chain_id}: {records} records")
-            else:
-                logger.warning(f"  ⚠️ No data extracted for {chain_id}")
-                log_etl_run(conn, chain_id, run_date, 'success', 0)
+    Returns:
+        Total records processed
+    """
+    # Databases created before dex_raw existed get it here, without a re-init
+    conn.execute(DEX_RAW_DDL)
+
+    date_ranges = {days_back: get_date_range(days_back=days_back) for days_back in days_back_list}
+    tasks = [(days_back, chain_id) for days_back in days_back_list for chain_id in chains]
+
+    # Extract concurrently, each task on its own cursor; DuckDB runs the scans
+    # in parallel and writes below stay serialized on the main connection.
+    # Threads rather than processes: a DuckDB file only accepts one writing
+    # process, and the cursors share the buffer pool. At most two tasks per
+    # worker are in flight, so finished Arrow results don't pile up while an
+    # earlier one is still being extracted.
+    ingest_locks = {chain_id: threading.Lock() for chain_id in chains}
+    max_workers = max(1, min(len(tasks), os.cpu_count() or 1))
+    total_records = 0
 
-        except Exception as e:
-            logger.error(f"  ❌ Error processing {chain_id}: {e}", exc_info=True)
-            log_etl_run(conn, chain_id, run_date, 'failed', 0, str(e))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        remaining = iter(tasks)
+
+        def submit_next():
+            task = next(remaining, None)
+            if task is not None:
+                days_back, chain_id = task
+                pending.append(executor.submit(
+                    _extract_with_cursor, conn, chain_id, *date_ranges[days_back],
+                    excluded_tokens, ingest_locks[chain_id]
+                ))
+
+        for _ in range(2 * max_workers):
+            submit_next()
+
+        for days_back in days_back_list:
+            begin_time, end_time = date_ranges[days_back]
+            run_date = begin_time.date()
+
+            logger.info(f"\n{'=' * 60}")
+            logger.info(f"Processing date: {run_date} (days_back={days_back})")
+            logger.info(f"Time range: {begin_time} to {end_time}")
+            logger.info(f"{'=' * 60}")
+
+            for chain_id in chains:
+                logger.info(f"\n  Processing chain: {chain_id}")
+                future = pending.popleft()
+                submit_next()
+
+                try:
+                    # Extracted data
+                    hourly_table, daily_table, total_table = future.result()
+
+                    # Load data
+                    if hourly_table is not None or daily_table is not None or total_table is not None:
+                        load_data(conn, hourly_table, daily_table, total_table, run_date)
+
+                        records = (len(hourly_table) if hourly_table is not None else 0) + \
+                                 (len(daily_table) if daily_table is not None else 0)
+                        total_records += records
+
+                        # Log success
+                        log_etl_run(conn, chain_id, run_date, 'success', records)
+                        logger.info(f"  ✅ Successfully processed {chain_id}: {records} records")
+                    else:
+                        logger.warning(f"  ⚠️ No data extracted for {chain_id}")
+                        log_etl_run(conn, chain_id, run_date, 'success', 0)
+
+                except Exception as e:
+                    logger.error(f"  ❌ Error processing {chain_id}: {e}", exc_info=True)
+                    log_etl_run(conn, chain_id, run_date, 'failed', 0, str(e))
 
     return total_records
 
@@ -452,7 +547,7 @@ def main():
     # Load configuration
     config_path = Path(__file__).parent.parent / "config" / "config.yaml"
     with open(config_path) as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=SafeLoader)
 
     # Setup logging
     logger = setup_logging(config)
@@ -477,20 +572,25 @@ def main():
     # Connect to database
     logger.info(f"Connecting to database: {db_path}")
     conn = duckdb.connect(str(db_path))
+    configure_connection(conn, config.get('duckdb'))
 
     # Get excluded tokens and chains
-    excluded_tokens = config['exclusions']['tokens']
+    # Excluded tokens are normalized to a plain list once and bound as a single
+    # list parameter; DuckDB turns "NOT IN $list" into a constant contains() check
+    excluded_tokens = list(config['exclusions'].get('tokens') or [])
     chains = config['chains']
 
+    raw_retention_days = config['data'].get('raw_retention_days')
     total_records = 0
 
     if init_mode:
         # Process multiple days
         logger.info(f"Processing {init_days} days of historical data...")
 
-        for days_back in range(init_days, 0, -1):
-            day_records = process_single_day(conn, chains, excluded_tokens, days_back, logger)
-            total_records += day_records
+        # Oldest day first, as before; extraction for all days overlaps
+        total_records = process_days(
+            conn, chains, excluded_tokens, list(range(init_days, 0, -1)), logger
+        )
 
         logger.info("\n" + "=" * 80)
         logger.info(f"✅ Initialization Complete!")
@@ -498,6 +598,8 @@ def main():
         logger.info(f"Days processed: {init_days}")
         logger.info("=" * 80)
 
+        prune_dex_raw(conn, raw_retention_days)
+
         # Close database connection before generating report
         conn.close()
         logger.info("Database connection closed")
@@ -537,6 +639,7 @@ def main():
     else:
         # Normal mode: process yesterday only
         total_records = process_single_day(conn, chains, excluded_tokens, 1, logger)
+        prune_dex_raw(conn, raw_retention_days)
 
         logger.info("\n" + "=" * 80)
         logger.info(f"ETL Process Complete - Total records processed: {total_records}")
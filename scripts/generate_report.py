@@ -3,19 +3,180 @@
 Generate interactive HTML reports from DuckDB data - Version 2
 Creates a standalone HTML file with all 5 charts displayed at once
 """
-import os
 import sys
+import gzip
+import base64
+import hashlib
+import json
+import shutil
 import yaml
 import duckdb
 import logging
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
+from jinja2 import Environment, FileSystemLoader
+
+try:
+    import brotli
+except ImportError:  # optional; only the .gz copy is written
+    brotli = None
+
+try:
+    import rcssmin
+    import rjsmin
+except ImportError:  # optional; the template is written unminified
+    rcssmin = rjsmin = None
+
+# Prefer PyYAML's libyaml-backed loader; the pure-Python one is much slower
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 
+# Report queries, keyed by the name load_data_from_db stores them under.
+# The per-chain payload is built and serialized to JSON entirely in DuckDB,
+# so Python only copies the strings into the page. Layout per chain:
+#     dexes:   [dex_name, ...]  (dictionary, busiest first; everything
+#              else refers to a DEX by its index here)
+#     daily:   {date: [[dex_idx, usage_count], ...]}
+#     hourly:  {date: {hour: [[dex_idx, usage_count], ...]}}
+#     total:   [[dex_idx, usage_count], ...]  (pie chart, largest first)
+#     ranking: {dex: [dex_idx, ...], values: [...]}  (top 15, smallest first)
+#     stats:   {'all' or date: [usage_count, unique_orders, dex_count]}
+# There's no global ORDER BY: the page looks groups up by key, and only the
+# DEX order inside a group matters, so each list is ordered by the
+# aggregate itself (dex_name breaks ties).
+REPORT_QUERIES = {
+    'payload': """
+        WITH
+        dex_ids AS (
+            -- Per-chain DEX dictionary: busiest (all-time) first
+            SELECT chain_id, dex_name,
+                   CAST(ROW_NUMBER() OVER (PARTITION BY chain_id ORDER BY max(total_usage) DESC NULLS LAST, dex_name) - 1 AS INTEGER) as dex_idx
+            FROM (
+                SELECT chain_id, dex_name, usage_count as total_usage FROM dex_usage_total
+                UNION ALL
+                SELECT DISTINCT chain_id, dex_name, NULL FROM dex_usage_daily
+                UNION ALL
+                SELECT DISTINCT chain_id, dex_name, NULL FROM dex_usage_hourly
+            )
+            GROUP BY chain_id, dex_name
+        ),
+        dexes AS (
+            SELECT chain_id, list(dex_name ORDER BY dex_idx) as dexes
+            FROM dex_ids GROUP BY chain_id
+        ),
+        total AS (
+            SELECT chain_id,
+                   list([dex_idx, usage_count] ORDER BY usage_count DESC, dex_name) as total,
+                   {'dex': list(dex_idx ORDER BY usage_count, dex_name DESC) FILTER (WHERE rank <= 15),
+                    'values': list(usage_count ORDER BY usage_count, dex_name DESC) FILTER (WHERE rank <= 15)} as ranking
+            FROM (
+                SELECT t.chain_id, t.dex_name, t.usage_count, d.dex_idx,
+                       ROW_NUMBER() OVER (PARTITION BY t.chain_id ORDER BY t.usage_count DESC, t.dex_name) as rank
+                FROM dex_usage_total t JOIN dex_ids d USING (chain_id, dex_name)
+            )
+            GROUP BY chain_id
+        ),
+        daily AS (
+            SELECT chain_id, map_from_entries(list((date, pairs) ORDER BY date)) as daily
+            FROM (
+                SELECT u.chain_id, strftime(u.date, '%Y-%m-%d') as date,
+                       list([d.dex_idx, u.usage_count] ORDER BY u.usage_count DESC, u.dex_name) as pairs
+                FROM dex_usage_daily u JOIN dex_ids d USING (chain_id, dex_name)
+                GROUP BY ALL
+            )
+            GROUP BY chain_id
+        ),
+        hourly AS (
+            SELECT chain_id, map_from_entries(list((date, hours) ORDER BY date)) as hourly
+            FROM (
+                SELECT chain_id, date, map_from_entries(list((CAST(hour AS VARCHAR), pairs) ORDER BY hour)) as hours
+                FROM (
+                    SELECT u.chain_id, strftime(u.date, '%Y-%m-%d') as date, u.hour,
+                           list([d.dex_idx, u.usage_count] ORDER BY u.usage_count DESC, u.dex_name) as pairs
+                    FROM dex_usage_hourly u JOIN dex_ids d USING (chain_id, dex_name)
+                    GROUP BY ALL
+                )
+                GROUP BY ALL
+            )
+            GROUP BY chain_id
+        ),
+        stats AS (
+            SELECT chain_id, map_from_entries(list((date, counts) ORDER BY date <> 'all', date)) as stats
+            FROM (
+                SELECT chain_id, 'all' as date,
+                       [SUM(usage_count), SUM(unique_orders), COUNT(*)] as counts
+                FROM dex_usage_total
+                GROUP BY chain_id
+                UNION ALL
+                SELECT chain_id, strftime(date, '%Y-%m-%d') as date,
+                       [SUM(usage_count), SUM(unique_orders), COUNT(DISTINCT dex_name)] as counts
+                FROM dex_usage_daily
+                GROUP BY ALL
+            )
+            GROUP BY chain_id
+        )
+        SELECT chain_id,
+               to_json({
+                   'dexes': dexes,
+                   'daily': COALESCE(daily, MAP {}),
+                   'hourly': COALESCE(hourly, MAP {}),
+                   'total': COALESCE(total, []),
+                   'ranking': COALESCE(ranking, {'dex': [], 'values': []}),
+                   'stats': COALESCE(stats, MAP {})
+               }) as payload
+        FROM dexes
+        LEFT JOIN total USING (chain_id)
+        LEFT JOIN daily USING (chain_id)
+        LEFT JOIN hourly USING (chain_id)
+        LEFT JOIN stats USING (chain_id)
+    """,
+    # Dates with daily data on any chain, for the date selector
+    'dates': """
+        SELECT DISTINCT strftime(date, '%Y-%m-%d') as date
+        FROM dex_usage_daily
+        ORDER BY date
+    """,
+}
+
+# Payload for a configured chain with no data yet
+EMPTY_CHAIN_JSON = '{"dexes":[],"daily":{},"hourly":{},"total":[],"ranking":{"dex":[],"values":[]},"stats":{}}'
+
+
+# config['duckdb'] keys that apply to the report's read-only connection
+# (parquet settings need the parquet extension, which the report never loads)
+REPORT_DUCKDB_SETTINGS = ('threads', 'memory_limit', 'preserve_insertion_order')
+
+# Report page template (Jinja2) and its static CSS/JS
+TEMPLATES_PATH = Path(__file__).parent.parent / "templates"
+REPORT_ASSETS = ('report.css', 'report.js')
+
+
+def get_duckdb_config(config):
+    """
+    Build the duckdb.connect() config for the report
+
+    Args:
+        config: Report configuration
+
+    Returns:
+        Dict of DuckDB settings; unset ones keep DuckDB's defaults
+    """
+    # Every query orders its own lists, so insertion order never matters here
+    settings = {'preserve_insertion_order': False}
+    for name, value in (config.get('duckdb') or {}).items():
+        if name in REPORT_DUCKDB_SETTINGS and value is not None:
+            settings[name] = value
+    return settings
+
+
 def setup_logging(config):
     """Setup logging configuration"""
     log_file = Path(__file__).parent.parent / config['logging']['log_file']
@@ -32,578 +193,235 @@ def setup_logging(config):
     return logging.getLogger(__name__)
 
 
-def load_data_from_db(conn, chains):
-    """Load all data from DuckDB for report generation"""
+def fetch_table(cursor, query):
+    """Run a query on a cursor and fetch the result as an Arrow table"""
+    return cursor.execute(query).fetch_arrow_table()
+
+
+def load_data_from_db(conn):
+    """Load pre-aggregated report data from DuckDB as Arrow tables"""
     logger = logging.getLogger(__name__)
     logger.info("Loading data from database...")
 
-    data = {}
+    # Run the queries concurrently, one cursor each; DuckDB releases the GIL
+    # while executing, so the wall clock approaches the slowest query.
+    # Fetched as Arrow so strings aren't copied into pandas object columns
+    cursors = {name: conn.cursor() for name in REPORT_QUERIES}
+    with ThreadPoolExecutor(max_workers=len(cursors)) as executor:
+        futures = {
+            name: executor.submit(fetch_table, cursor, REPORT_QUERIES[name])
+            for name, cursor in cursors.items()
+        }
+    data = {name: future.result() for name, future in futures.items()}
+
+    for cursor in cursors.values():
+        cursor.close()
+
+    logger.info(f"Loaded report data for {len(data['payload'])} chains")
+    logger.info(f"Loaded {len(data['dates'])} dates")
+
+    return data
+
 
-    # Load hourly data
-    hourly_query = """
-        SELECT *
-        FROM dex_usage_hourly
-        ORDER BY chain_id, date, hour, usage_count DESC
+def build_payload(data, chains):
     """
-    data['hourly'] = conn.execute(hourly_query).df()
-    logger.info(f"Loaded {len(data['hourly'])} hourly records")
+    Collect the per-chain JSON payloads built by the payload query
 
-    # Load daily data
-    daily_query = """
-        SELECT *
-        FROM dex_usage_daily
-        ORDER BY chain_id, date, usage_count DESC
+    Args:
+        data: Tables from load_data_from_db
+        chains: Chains from config (always present, even with no data)
+
+    Returns:
+        Dict of chain_id -> payload JSON string
     """
-    data['daily'] = conn.execute(daily_query).df()
-    logger.info(f"Loaded {len(data['daily'])} daily records")
-
-    # Load total data
-    total_query = """
-        SELECT *
-        FROM dex_usage_total
-        ORDER BY chain_id, usage_count DESC
+    payload = {chain_id: EMPTY_CHAIN_JSON for chain_id in chains}
+    columns = data['payload'].to_pydict()
+    payload.update(zip(columns['chain_id'], columns['payload']))
+    return payload
+
+
+def encode_chain_json(chain_json, compress):
     """
-    data['total'] = conn.execute(total_query).df()
-    logger.info(f"Loaded {len(data['total'])} total records")
+    Prepare a chain's payload for its script block
 
-    return data
+    Args:
+        chain_json: Payload JSON string from build_payload
+        compress: Gzip + base64 the payload (report.compress_data)
 
+    Returns:
+        Block content: base64 gzip, or the JSON with "</" escaped so a DEX
+        name can't close the script block
+    """
+    if compress:
+        # mtime=0 keeps the output identical for identical data
+        return base64.b64encode(gzip.compress(chain_json.encode('utf-8'), compresslevel=9, mtime=0)).decode('ascii')
+    return chain_json.replace('</', '<\\/')
 
-def create_interactive_html(data, config):
-    """Create interactive HTML report with all 5 charts"""
+
+def minify_asset(name, text):
+    """
+    Minify a static CSS or JS asset, picked by its suffix
+
+    Only the static assets go through here; the JSON data blocks are already
+    compact. Returns the text unchanged if rcssmin/rjsmin aren't installed.
+    """
+    if rcssmin is None or rjsmin is None:
+        return text
+    if name.endswith('.css'):
+        return rcssmin.cssmin(text)
+    if name.endswith('.js'):
+        return rjsmin.jsmin(text)
+    return text
+
+
+@lru_cache(maxsize=None)
+def load_asset(name):
+    """Read a static asset from TEMPLATES_PATH, minified, once per process"""
+    return minify_asset(name, (TEMPLATES_PATH / name).read_text(encoding='utf-8'))
+
+
+def asset_version(name):
+    """Short content hash of an asset, used to bust browser caches"""
+    return hashlib.sha1(load_asset(name).encode('utf-8')).hexdigest()[:10]
+
+
+@lru_cache(maxsize=None)
+def get_report_template():
+    """Compile the report template once per process"""
+    env = Environment(
+        loader=FileSystemLoader(str(TEMPLATES_PATH)),
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    return env.get_template('report.html.j2')
+
+
+def write_static_assets(reports_path):
+    """
+    Write the report's CSS/JS next to it (report.standalone: false)
+
+    Files whose content hasn't changed are left alone, so their mtime (and
+    the browser's cached copy) survive report refreshes.
+
+    Args:
+        reports_path: Directory the report is written to
+
+    Returns:
+        List of (re)written file paths
+    """
+    written = []
+    for name in REPORT_ASSETS:
+        asset_file = reports_path / name
+        text = load_asset(name)
+        if asset_file.exists() and asset_file.read_text(encoding='utf-8') == text:
+            continue
+        asset_file.write_text(text, encoding='utf-8')
+        written.append(asset_file)
+    return written
+
+
+def write_data_shards(payload, reports_path):
+    """
+    Write each chain's payload to its own file (report.shard_data)
+
+    Args:
+        payload: Dict of chain_id -> payload JSON string from build_payload
+        reports_path: Directory the report is written to
+
+    Returns:
+        Tuple of (dict of chain_id -> URL the page fetches, list of written
+        file paths)
+    """
+    shards = {}
+    written = []
+    for chain_id, chain_json in payload.items():
+        shard_file = reports_path / f"data_{chain_id}.json"
+        shard_file.write_text(chain_json, encoding='utf-8')
+        # Content hash in the URL, so a browser never keeps yesterday's data
+        version = hashlib.sha1(chain_json.encode('utf-8')).hexdigest()[:10]
+        shards[chain_id] = f"{shard_file.name}?v={version}"
+        written.append(shard_file)
+    return shards, written
+
+
+def write_interactive_html(data, payload, config, f, shards=None):
+    """
+    Write the interactive HTML report with all 5 charts
+
+    Renders templates/report.html.j2 straight into f. report.css and
+    report.js are inlined, or linked with report.standalone: false (see
+    write_static_assets). Each chain's payload is written as its own JSON
+    script block, which the page parses only when that chain is first
+    selected (inflating it first with report.compress_data). By default the
+    data stays in the page, so it also works opened from disk, where fetch()
+    of sidecar data files would be blocked.
+
+    Args:
+        data: Tables from load_data_from_db
+        payload: Dict of chain_id -> payload JSON string from build_payload
+        config: Report configuration
+        f: Text file object to write to
+        shards: Optional dict of chain_id -> data file URL from
+            write_data_shards; the page then fetches each chain's data
+            instead of embedding it
+    """
     logger = logging.getLogger(__name__)
     logger.info("Generating interactive HTML...")
 
     chains = config['chains']
 
-    # Prepare data for JavaScript
-    daily_df = data['daily']
-    hourly_df = data['hourly']
-    total_df = data['total']
-
-    # Convert data to JSON for embedding
-    daily_json = daily_df.to_json(orient='records', date_format='iso')
-    hourly_json = hourly_df.to_json(orient='records', date_format='iso')
-    total_json = total_df.to_json(orient='records', date_format='iso')
-
-    # Generate HTML with all 5 charts
-    html = f"""
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{config['report']['title']}</title>
-    <script src="https://cdn.plot.ly/plotly-2.27.0.min.js"></script>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', 'Roboto', 'Helvetica', 'Arial', sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }}
-
-        .container {{
-            max-width: 1400px;
-            margin: 0 auto;
-        }}
-
-        .header {{
-            background: white;
-            padding: 30px;
-            border-radius: 15px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-            margin-bottom: 30px;
-        }}
-
-        h1 {{
-            color: #2d3748;
-            font-size: 2.5em;
-            margin-bottom: 10px;
-        }}
-
-        .subtitle {{
-            color: #718096;
-            font-size: 1.1em;
-        }}
-
-        .controls {{
-            background: white;
-            padding: 25px;
-            border-radius: 15px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-            margin-bottom: 30px;
-            display: flex;
-            gap: 20px;
-            flex-wrap: wrap;
-            align-items: center;
-        }}
-
-        .control-group {{
-            display: flex;
-            flex-direction: column;
-            gap: 8px;
-        }}
-
-        .control-label {{
-            font-weight: 600;
-            color: #2d3748;
-            font-size: 0.9em;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-
-        select {{
-            padding: 12px 16px;
-            border: 2px solid #e2e8f0;
-            border-radius: 8px;
-            font-size: 1em;
-            color: #2d3748;
-            background: white;
-            cursor: pointer;
-            transition: all 0.3s;
-            min-width: 200px;
-        }}
-
-        select:hover {{
-            border-color: #667eea;
-        }}
-
-        select:focus {{
-            outline: none;
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102,126,234,0.1);
-        }}
-
-        .chart-container {{
-            background: white;
-            padding: 25px;
-            border-radius: 15px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-            margin-bottom: 30px;
-        }}
-
-        .chart-title {{
-            font-size: 1.4em;
-            color: #2d3748;
-            margin-bottom: 15px;
-            font-weight: 600;
-        }}
-
-        .stats-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-            margin-bottom: 30px;
-        }}
-
-        .stat-card {{
-            background: white;
-            padding: 25px;
-            border-radius: 15px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.1);
-        }}
-
-        .stat-label {{
-            color: #718096;
-            font-size: 0.9em;
-            margin-bottom: 8px;
-            text-transform: uppercase;
-            letter-spacing: 0.5px;
-        }}
-
-        .stat-value {{
-            font-size: 2.5em;
-            font-weight: 700;
-            color: #667eea;
-        }}
-
-        .footer {{
-            text-align: center;
-            color: white;
-            padding: 20px;
-            font-size: 0.9em;
-        }}
-
-        .loading {{
-            text-align: center;
-            padding: 40px;
-            color: #718096;
-        }}
-
-        @media (max-width: 768px) {{
-            h1 {{
-                font-size: 1.8em;
-            }}
-
-            .controls {{
-                flex-direction: column;
-                align-items: stretch;
-            }}
-
-            select {{
-                width: 100%;
-            }}
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📊 {config['report']['title']}</h1>
-            <div class="subtitle">Last updated: <span id="lastUpdate">{datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')}</span></div>
-        </div>
-
-        <div class="controls">
-            <div class="control-group">
-                <label class="control-label">Blockchain</label>
-                <select id="chainSelect">
-                    {"".join([f'<option value="{chain}">{chain.upper()}</option>' for chain in chains])}
-                </select>
-            </div>
-
-            <div class="control-group">
-                <label class="control-label">Date</label>
-                <select id="dateSelect">
-                    <option value="all">All Dates</option>
-                </select>
-            </div>
-        </div>
-
-        <div class="stats-grid" id="statsGrid"></div>
-
-        <div class="chart-container">
-            <div class="chart-title">1. DEX使用次数 - 按天统计</div>
-            <div id="chart1"></div>
-        </div>
-
-        <div class="chart-container">
-            <div class="chart-title">2. DEX使用次数 - 按天统计（百分比）</div>
-            <div id="chart2"></div>
-        </div>
-
-        <div class="chart-container">
-            <div class="chart-title">3. DEX使用次数 - 按小时统计</div>
-            <div id="chart3"></div>
-        </div>
-
-        <div class="chart-container">
-            <div class="chart-title">4. DEX使用占比分布</div>
-            <div id="chart4"></div>
-        </div>
-
-        <div class="chart-container">
-            <div class="chart-title">5. DEX使用次数排行</div>
-            <div id="chart5"></div>
-        </div>
-
-        <div class="footer">
-            <p>DEX Analytics Dashboard | Data updated daily at {config['time']['daily_run_hour']:02d}:{config['time']['daily_run_minute']:02d} UTC</p>
-        </div>
-    </div>
-
-    <script>
-        // Embedded data
-        const dailyData = {daily_json};
-        const hourlyData = {hourly_json};
-        const totalData = {total_json};
-
-        // Parse dates
-        dailyData.forEach(d => d.date = new Date(d.date));
-        hourlyData.forEach(d => d.date = new Date(d.date));
-
-        // Get available dates
-        const availableDates = [...new Set(dailyData.map(d => d.date.toISOString().split('T')[0]))].sort();
-
-        // Populate date select
-        const dateSelect = document.getElementById('dateSelect');
-        availableDates.forEach(date => {{
-            const option = document.createElement('option');
-            option.value = date;
-            option.textContent = date;
-            dateSelect.appendChild(option);
-        }});
-
-        // Color palette
-        const colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b', '#fa709a', '#fee140', '#30cfd0', '#ff6b6b', '#4ecdc4'];
-
-        function filterDailyData(chain, date) {{
-            let filtered = dailyData.filter(d => d.chain_id === chain);
-            if (date !== 'all') {{
-                filtered = filtered.filter(d => d.date.toISOString().split('T')[0] === date);
-            }}
-            return filtered;
-        }}
-
-        function filterHourlyData(chain, date) {{
-            let filtered = hourlyData.filter(d => d.chain_id === chain);
-            if (date !== 'all') {{
-                filtered = filtered.filter(d => d.date.toISOString().split('T')[0] === date);
-            }}
-            return filtered;
-        }}
-
-        function filterTotalData(chain) {{
-            return totalData.filter(d => d.chain_id === chain);
-        }}
-
-        function updateStats(chain, date) {{
-            let data;
-            const statsGrid = document.getElementById('statsGrid');
-
-            if (date === 'all') {{
-                // Show total aggregated data
-                data = filterTotalData(chain);
-                if (data.length === 0) {{
-                    statsGrid.innerHTML = '';
-                    return;
-                }}
-
-                const totalUsage = data.reduce((sum, d) => sum + d.usage_count, 0);
-                const totalOrders = data.reduce((sum, d) => sum + d.unique_orders, 0);
-                const dexCount = data.length;
-
-                statsGrid.innerHTML = `
-                    <div class="stat-card">
-                        <div class="stat-label">Total Usage</div>
-                        <div class="stat-value">${{totalUsage.toLocaleString()}}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Unique Orders</div>
-                        <div class="stat-value">${{totalOrders.toLocaleString()}}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Active DEXes</div>
-                        <div class="stat-value">${{dexCount}}</div>
-                    </div>
-                `;
-            }} else {{
-                // Show data for specific date
-                data = filterDailyData(chain, date);
-                if (data.length === 0) {{
-                    statsGrid.innerHTML = '';
-                    return;
-                }}
-
-                const totalUsage = data.reduce((sum, d) => sum + d.usage_count, 0);
-                const totalOrders = data.reduce((sum, d) => sum + d.unique_orders, 0);
-                const dexCount = [...new Set(data.map(d => d.dex_name))].length;
-
-                statsGrid.innerHTML = `
-                    <div class="stat-card">
-                        <div class="stat-label">Usage ({{date}})</div>
-                        <div class="stat-value">${{totalUsage.toLocaleString()}}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Orders ({{date}})</div>
-                        <div class="stat-value">${{totalOrders.toLocaleString()}}</div>
-                    </div>
-                    <div class="stat-card">
-                        <div class="stat-label">Active DEXes</div>
-                        <div class="stat-value">${{dexCount}}</div>
-                    </div>
-                `;
-            }}
-        }}
-
-        // Chart 1: 按天统计柱状图
-        function createChart1(chain, date) {{
-            const data = filterDailyData(chain, date);
-            if (data.length === 0) {{
-                document.getElementById('chart1').innerHTML = '<div class="loading">No data available</div>';
-                return;
-            }}
-
-            const byDate = {{}};
-            data.forEach(d => {{
-                const key = d.date.toISOString().split('T')[0];
-                if (!byDate[key]) byDate[key] = {{}};
-                byDate[key][d.dex_name] = d.usage_count;
-            }});
-
-            const dates = Object.keys(byDate).sort();
-            const dexNames = [...new Set(data.map(d => d.dex_name))];
-
-            const traces = dexNames.map((dex, idx) => ({{
-                x: dates,
-                y: dates.map(d => byDate[d][dex] || 0),
-                name: dex,
-                type: 'bar',
-                marker: {{ color: colors[idx % colors.length] }}
-            }}));
-
-            const layout = {{
-                height: 500,
-                barmode: 'stack',
-                xaxis: {{ title: '日期' }},
-                yaxis: {{ title: '使用次数' }},
-                margin: {{ t: 20, b: 60, l: 60, r: 20 }}
-            }};
-
-            Plotly.newPlot('chart1', traces, layout, {{responsive: true}});
-        }}
-
-        // Chart 2: 按天统计百分比图
-        function createChart2(chain, date) {{
-            const data = filterDailyData(chain, date);
-            if (data.length === 0) {{
-                document.getElementById('chart2').innerHTML = '<div class="loading">No data available</div>';
-                return;
-            }}
-
-            const byDate = {{}};
-            const totals = {{}};
-            data.forEach(d => {{
-                const key = d.date.toISOString().split('T')[0];
-                if (!byDate[key]) byDate[key] = {{}};
-                if (!totals[key]) totals[key] = 0;
-                byDate[key][d.dex_name] = d.usage_count;
-                totals[key] += d.usage_count;
-            }});
-
-            const dates = Object.keys(byDate).sort();
-            const dexNames = [...new Set(data.map(d => d.dex_name))];
-
-            const traces = dexNames.map((dex, idx) => ({{
-                x: dates,
-                y: dates.map(d => (byDate[d][dex] || 0) / totals[d] * 100),
-                name: dex,
-                type: 'bar',
-                marker: {{ color: colors[idx % colors.length] }}
-            }}));
-
-            const layout = {{
-                height: 500,
-                barmode: 'stack',
-                xaxis: {{ title: '日期' }},
-                yaxis: {{ title: '百分比 (%)', ticksuffix: '%' }},
-                margin: {{ t: 20, b: 60, l: 60, r: 20 }}
-            }};
-
-            Plotly.newPlot('chart2', traces, layout, {{responsive: true}});
-        }}
-
-        // Chart 3: 按小时统计
-        function createChart3(chain, date) {{
-            const data = filterHourlyData(chain, date);
-            if (data.length === 0) {{
-                document.getElementById('chart3').innerHTML = '<div class="loading">No data available</div>';
-                return;
-            }}
-
-            const byHour = {{}};
-            data.forEach(d => {{
-                const key = `${{d.date.toISOString().split('T')[0]}} ${{String(d.hour).padStart(2, '0')}}:00`;
-                if (!byHour[key]) byHour[key] = {{}};
-                byHour[key][d.dex_name] = d.usage_count;
-            }});
-
-            const hours = Object.keys(byHour).sort();
-            const dexNames = [...new Set(data.map(d => d.dex_name))];
-
-            const traces = dexNames.map((dex, idx) => ({{
-                x: hours,
-                y: hours.map(h => byHour[h][dex] || 0),
-                name: dex,
-                type: 'bar',
-                marker: {{ color: colors[idx % colors.length] }}
-            }}));
-
-            const layout = {{
-                height: 500,
-                barmode: 'stack',
-                xaxis: {{ title: '时间', tickangle: 45 }},
-                yaxis: {{ title: '使用次数' }},
-                margin: {{ t: 20, b: 100, l: 60, r: 20 }}
-            }};
-
-            Plotly.newPlot('chart3', traces, layout, {{responsive: true}});
-        }}
-
-        // Chart 4: 饼图
-        function createChart4(chain) {{
-            const data = filterTotalData(chain);
-            if (data.length === 0) {{
-                document.getElementById('chart4').innerHTML = '<div class="loading">No data available</div>';
-                return;
-            }}
-
-            const trace = {{
-                labels: data.map(d => d.dex_name),
-                values: data.map(d => d.usage_count),
-                type: 'pie',
-                marker: {{ colors: colors }},
-                textposition: 'inside',
-                textinfo: 'label+percent',
-                hovertemplate: '<b>%{{label}}</b><br>Usage: %{{value}}<br>Percentage: %{{percent}}<extra></extra>'
-            }};
-
-            const layout = {{
-                height: 500,
-                margin: {{ t: 20, b: 20, l: 20, r: 20 }},
-                showlegend: true
-            }};
-
-            Plotly.newPlot('chart4', [trace], layout, {{responsive: true}});
-        }}
-
-        // Chart 5: 排行榜
-        function createChart5(chain) {{
-            const data = filterTotalData(chain).sort((a, b) => a.usage_count - b.usage_count).slice(-15);
-            if (data.length === 0) {{
-                document.getElementById('chart5').innerHTML = '<div class="loading">No data available</div>';
-                return;
-            }}
-
-            const trace = {{
-                x: data.map(d => d.usage_count),
-                y: data.map(d => d.dex_name),
-                type: 'bar',
-                orientation: 'h',
-                marker: {{ color: '#667eea' }},
-                text: data.map(d => d.usage_count.toLocaleString()),
-                textposition: 'outside'
-            }};
-
-            const layout = {{
-                height: 500,
-                xaxis: {{ title: '使用次数' }},
-                margin: {{ t: 20, b: 40, l: 150, r: 40 }}
-            }};
-
-            Plotly.newPlot('chart5', [trace], layout, {{responsive: true}});
-        }}
-
-        function updateCharts() {{
-            const chain = document.getElementById('chainSelect').value;
-            const date = document.getElementById('dateSelect').value;
-
-            updateStats(chain, date);
-            createChart1(chain, date);
-            createChart2(chain, date);
-            createChart3(chain, date);
-            createChart4(chain);
-            createChart5(chain);
-        }}
-
-        // Event listeners
-        document.getElementById('chainSelect').addEventListener('change', updateCharts);
-        document.getElementById('dateSelect').addEventListener('change', updateCharts);
-
-        // Initial load
-        updateCharts();
-    </script>
-</body>
-</html>
-"""
+    available_dates = data['dates']['date'].to_pylist()
+
+    compress_data = config['report'].get('compress_data', False)
+    standalone = config['report'].get('standalone', True)
+
+    template = get_report_template()
+    f.writelines(template.generate(
+        title=config['report']['title'],
+        last_updated=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC'),
+        chains=chains,
+        run_hour=config['time']['daily_run_hour'],
+        run_minute=config['time']['daily_run_minute'],
+        standalone=standalone,
+        report_css=load_asset('report.css'),
+        report_js=load_asset('report.js'),
+        css_version=asset_version('report.css'),
+        js_version=asset_version('report.js'),
+        compress_data=compress_data,
+        shards=shards,
+        payload={
+            chain_id: '' if shards else encode_chain_json(chain_json, compress_data)
+            for chain_id, chain_json in payload.items()
+        },
+        available_dates=json.dumps(available_dates),
+    ))
+
+
+def write_compressed_copies(report_file):
+    """
+    Write precompressed copies of the report next to it
+
+    Static hosts with gzip_static (or brotli_static) serve these directly
+    instead of compressing on every request.
 
-    return html
+    Args:
+        report_file: Path of the generated HTML report
+
+    Returns:
+        List of written file paths
+    """
+    gz_file = report_file.with_name(report_file.name + '.gz')
+    with open(report_file, 'rb') as src, gzip.open(gz_file, 'wb', compresslevel=9) as dst:
+        shutil.copyfileobj(src, dst)
+    written = [gz_file]
+
+    if brotli is not None:
+        br_file = report_file.with_name(report_file.name + '.br')
+        br_file.write_bytes(brotli.compress(report_file.read_bytes(), quality=11))
+        written.append(br_file)
+
+    return written
 
 
 def main():
@@ -611,7 +429,7 @@ def main():
     # Load configuration
     config_path = Path(__file__).parent.parent / "config" / "config.yaml"
     with open(config_path) as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=SafeLoader)
 
     # Setup logging
     logger = setup_logging(config)
@@ -629,31 +447,48 @@ def main():
 
     # Connect to database
     logger.info(f"Connecting to database: {db_path}")
-    conn = duckdb.connect(str(db_path), read_only=True)
+    conn = duckdb.connect(str(db_path), read_only=True, config=get_duckdb_config(config))
 
     # Load data
-    data = load_data_from_db(conn, config['chains'])
+    data = load_data_from_db(conn)
 
     # Close connection
     conn.close()
 
     # Check if we have data
-    if len(data['daily']) == 0 and len(data['hourly']) == 0:
+    if len(data['payload']) == 0:
         logger.warning("No data available in database. Please run ETL first.")
         sys.exit(1)
 
-    # Generate HTML
-    html = create_interactive_html(data, config)
-
-    # Save report
     reports_path = Path(__file__).parent.parent / config['data']['reports_path']
     reports_path.mkdir(parents=True, exist_ok=True)
 
+    # Collected once, for both the data files and the page
+    payload = build_payload(data, config['chains'])
+
+    # Per-chain data files, fetched by the page (report.shard_data)
+    written = []
+    shards = None
+    if config['report'].get('shard_data', False):
+        shards, shard_files = write_data_shards(payload, reports_path)
+        for shard_file in shard_files:
+            logger.info(f"Wrote {shard_file} ({shard_file.stat().st_size} bytes)")
+        written.extend(shard_files)
+
+    # Generate HTML straight into the report file
     report_file = reports_path / "index.html"
     with open(report_file, 'w', encoding='utf-8') as f:
-        f.write(html)
+        write_interactive_html(data, payload, config, f, shards)
 
     logger.info(f"✅ Report generated: {report_file}")
+    written.append(report_file)
+    if not config['report'].get('standalone', True):
+        for asset_file in write_static_assets(reports_path):
+            logger.info(f"Wrote {asset_file}")
+            written.append(asset_file)
+    for written_file in written:
+        for compressed_file in write_compressed_copies(written_file):
+            logger.info(f"Wrote {compressed_file} ({compressed_file.stat().st_size} bytes)")
     logger.info("=" * 80)
 
 
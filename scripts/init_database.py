@@ -10,6 +10,14 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+from utils.schema import DEX_RAW_DDL
+
+# Secondary indexes created by earlier versions. Every query scans whole
+# (chain_id, date) ranges, which DuckDB's row-group min/max zonemaps already
+# prune, so these only cost maintenance on each load; the primary keys stay.
+OBSOLETE_INDEXES = ['idx_hourly_date', 'idx_daily_date', 'idx_etl_log']
+
+
 def init_database(db_path):
     """
     Initialize DuckDB database with required tables
@@ -25,6 +33,10 @@ def init_database(db_path):
     # Connect to database
     conn = duckdb.connect(db_path)
 
+    # All DDL runs in one transaction, so the catalog is written once; if a
+    # statement fails nothing is committed and no half-created schema is left
+    conn.begin()
+
     # Create tables
     print("Creating tables...")
 
@@ -33,12 +45,11 @@ def init_database(db_path):
         CREATE TABLE IF NOT EXISTS dex_usage_hourly (
             chain_id VARCHAR NOT NULL,
             date DATE NOT NULL,
-            hour INTEGER NOT NULL,
+            hour UTINYINT NOT NULL,
             dex_name VARCHAR NOT NULL,
-            usage_count INTEGER NOT NULL,
+            usage_count UINTEGER NOT NULL,
             total_weight BIGINT NOT NULL,
-            unique_orders INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            unique_orders UINTEGER NOT NULL,
             PRIMARY KEY (chain_id, date, hour, dex_name)
         )
     """)
@@ -50,24 +61,24 @@ def init_database(db_path):
             chain_id VARCHAR NOT NULL,
             date DATE NOT NULL,
             dex_name VARCHAR NOT NULL,
-            usage_count INTEGER NOT NULL,
+            usage_count UINTEGER NOT NULL,
             total_weight BIGINT NOT NULL,
-            unique_orders INTEGER NOT NULL,
+            unique_orders UINTEGER NOT NULL,
             percentage DECIMAL(5,2),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (chain_id, date, dex_name)
         )
     """)
     print("✓ Created dex_usage_daily table")
 
-    # Total statistics table (aggregated)
+    # Total statistics table (aggregated; the counts are all-time running sums,
+    # so they stay 64-bit unlike the per-bucket hourly and daily counts)
     conn.execute("""
         CREATE TABLE IF NOT EXISTS dex_usage_total (
             chain_id VARCHAR NOT NULL,
             dex_name VARCHAR NOT NULL,
-            usage_count INTEGER NOT NULL,
+            usage_count UBIGINT NOT NULL,
             total_weight BIGINT NOT NULL,
-            unique_orders INTEGER NOT NULL,
+            unique_orders UBIGINT NOT NULL,
             percentage DECIMAL(5,2),
             first_seen DATE,
             last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -76,6 +87,9 @@ def init_database(db_path):
     """)
     print("✓ Created dex_usage_total table")
 
+    conn.execute(DEX_RAW_DDL)
+    print("✓ Created dex_raw table")
+
     # ETL run log table
     conn.execute("""
         CREATE TABLE IF NOT EXISTS etl_run_log (
@@ -97,25 +111,10 @@ def init_database(db_path):
         CREATE SEQUENCE IF NOT EXISTS etl_run_log_seq START 1
     """)
 
-    # Create indexes for better query performance
-    print("Creating indexes...")
-
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_hourly_date
-        ON dex_usage_hourly(chain_id, date)
-    """)
-
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_daily_date
-        ON dex_usage_daily(chain_id, date)
-    """)
-
-    conn.execute("""
-        CREATE INDEX IF NOT EXISTS idx_etl_log
-        ON etl_run_log(chain_id, run_date, status)
-    """)
+    for index_name in OBSOLETE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index_name}")
 
-    print("✓ Created indexes")
+    conn.commit()
 
     # Verify tables
     result = conn.execute("""
@@ -3,237 +3,306 @@
 Test script to verify the DEX Analytics setup
 Run this after installation to check if everything is configured correctly
 """
+import io
 import os
+import importlib.util
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-# Color codes for terminal output
-GREEN = '\033[92m'
-RED = '\033[91m'
-YELLOW = '\033[93m'
-BLUE = '\033[94m'
-RESET = '\033[0m'
+# Color codes for terminal output (left out when redirected, e.g. to a log)
+_TTY = sys.stdout.isatty()
+GREEN = '\033[92m' if _TTY else ''
+RED = '\033[91m' if _TTY else ''
+YELLOW = '\033[93m' if _TTY else ''
+BLUE = '\033[94m' if _TTY else ''
+RESET = '\033[0m' if _TTY else ''
 
+CONFIG_PATH = Path(__file__).parent.parent / "config" / "config.yaml"
 
-def check_python_version():
+
+@lru_cache(maxsize=4)
+def _load_config(path_str, mtime):
+    """Parse a config file; cached per path and modification time"""
+    import yaml
+    # Prefer PyYAML's libyaml-backed loader; the pure-Python one is much slower
+    try:
+        from yaml import CSafeLoader as SafeLoader
+    except ImportError:
+        from yaml import SafeLoader
+    with open(path_str) as f:
+        return yaml.load(f, Loader=SafeLoader)
+
+
+def load_config():
+    """Load config/config.yaml, parsing it only once unless it changes"""
+    return _load_config(str(CONFIG_PATH), CONFIG_PATH.stat().st_mtime)
+
+
+# Each check prints its lines to out (run_check buffers them) and returns
+# whether it passed
+def check_python_version(out=sys.stdout):
     """Check if Python version is 3.8+"""
-    print(f"\n{BLUE}[1/8] Checking Python version...{RESET}")
+    print(f"\n{BLUE}[1/8] Checking Python version...{RESET}", file=out)
     version = sys.version_info
     if version.major >= 3 and version.minor >= 8:
-        print(f"  {GREEN}✓ Python {version.major}.{version.minor}.{version.micro}{RESET}")
+        print(f"  {GREEN}✓ Python {version.major}.{version.minor}.{version.micro}{RESET}", file=out)
         return True
     else:
-        print(f"  {RED}✗ Python version too old: {version.major}.{version.minor}.{version.micro}{RESET}")
-        print(f"  {YELLOW}  Required: Python 3.8+{RESET}")
+        print(f"  {RED}✗ Python version too old: {version.major}.{version.minor}.{version.micro}{RESET}", file=out)
+        print(f"  {YELLOW}  Required: Python 3.8+{RESET}", file=out)
         return False
 
 
-def check_dependencies():
+def check_dependencies(out=sys.stdout):
     """Check if required packages are installed"""
-    print(f"\n{BLUE}[2/8] Checking dependencies...{RESET}")
-    required = ['duckdb', 'pandas', 'yaml', 'plotly']
+    print(f"\n{BLUE}[2/8] Checking dependencies...{RESET}", file=out)
+    required = ['duckdb', 'pandas', 'pyarrow', 'yaml', 'plotly', 'jinja2']
     missing = []
 
+    # find_spec only locates the package; importing pandas/plotly just to
+    # check they exist would dominate this script's runtime
     for package in required:
-        try:
-            if package == 'yaml':
-                __import__('yaml')
-            else:
-                __import__(package)
-            print(f"  {GREEN}✓ {package}{RESET}")
-        except ImportError:
-            print(f"  {RED}✗ {package} not installed{RESET}")
+        if importlib.util.find_spec(package) is not None:
+            print(f"  {GREEN}✓ {package}{RESET}", file=out)
+        else:
+            print(f"  {RED}✗ {package} not installed{RESET}", file=out)
             missing.append(package)
 
     if missing:
-        print(f"\n  {YELLOW}To install missing packages:{RESET}")
-        print(f"  pip install {' '.join(missing)}")
+        print(f"\n  {YELLOW}To install missing packages:{RESET}", file=out)
+        print(f"  pip install {' '.join(missing)}", file=out)
         return False
 
     return True
 
 
-def check_config_file():
+def check_config_file(out=sys.stdout):
     """Check if config file exists and is valid"""
-    print(f"\n{BLUE}[3/8] Checking configuration file...{RESET}")
-    config_path = Path(__file__).parent.parent / "config" / "config.yaml"
-
-    if not config_path.exists():
-        print(f"  {RED}✗ Config file not found: {config_path}{RESET}")
+    print(f"\n{BLUE}[3/8] Checking configuration file...{RESET}", file=out)
+    if not CONFIG_PATH.exists():
+        print(f"  {RED}✗ Config file not found: {CONFIG_PATH}{RESET}", file=out)
         return False
 
     try:
-        import yaml
-        with open(config_path) as f:
-            config = yaml.safe_load(f)
+        config = load_config()
 
         # Check required keys
         required_keys = ['chains', 'data', 'time', 'logging', 'exclusions']
         for key in required_keys:
             if key in config:
-                print(f"  {GREEN}✓ {key} configured{RESET}")
+                print(f"  {GREEN}✓ {key} configured{RESET}", file=out)
             else:
-                print(f"  {RED}✗ Missing key: {key}{RESET}")
+                print(f"  {RED}✗ Missing key: {key}{RESET}", file=out)
                 return False
 
         # Show chains
-        print(f"    Chains: {', '.join(config['chains'])}")
+        print(f"    Chains: {', '.join(config['chains'])}", file=out)
 
         return True
     except Exception as e:
-        print(f"  {RED}✗ Error reading config: {e}{RESET}")
+        print(f"  {RED}✗ Error reading config: {e}{RESET}", file=out)
         return False
 
 
-def check_directories():
+def check_directories(out=sys.stdout):
     """Check if required directories exist"""
-    print(f"\n{BLUE}[4/8] Checking directory structure...{RESET}")
+    print(f"\n{BLUE}[4/8] Checking directory structure...{RESET}", file=out)
     base_path = Path(__file__).parent.parent
     required_dirs = ['config', 'utils', 'scripts', 'data', 'reports', 'logs']
 
+    # One directory listing instead of a stat per name
+    with os.scandir(base_path) as entries:
+        present = {entry.name for entry in entries if entry.is_dir()}
+
     all_exist = True
     for dir_name in required_dirs:
-        dir_path = base_path / dir_name
-        if dir_path.exists():
-            print(f"  {GREEN}✓ {dir_name}/{RESET}")
+        if dir_name in present:
+            print(f"  {GREEN}✓ {dir_name}/{RESET}", file=out)
         else:
-            print(f"  {RED}✗ {dir_name}/ not found{RESET}")
+            print(f"  {RED}✗ {dir_name}/ not found{RESET}", file=out)
             all_exist = False
 
     return all_exist
 
 
-def check_database():
+def check_database(out=sys.stdout):
     """Check if database exists and is accessible"""
-    print(f"\n{BLUE}[5/8] Checking database...{RESET}")
+    print(f"\n{BLUE}[5/8] Checking database...{RESET}", file=out)
 
-    import yaml
-    config_path = Path(__file__).parent.parent / "config" / "config.yaml"
-    with open(config_path) as f:
-        config = yaml.safe_load(f)
+    config = load_config()
 
     db_path = Path(__file__).parent.parent / config['data']['database_path']
 
     if not db_path.exists():
-        print(f"  {YELLOW}⚠ Database not found: {db_path}{RESET}")
-        print(f"  {YELLOW}  Run: python scripts/init_database.py{RESET}")
+        print(f"  {YELLOW}⚠ Database not found: {db_path}{RESET}", file=out)
+        print(f"  {YELLOW}  Run: python scripts/init_database.py{RESET}", file=out)
         return False
 
     try:
         import duckdb
-        conn = duckdb.connect(str(db_path), read_only=True)
-
-        # Check tables
-        tables = conn.execute("""
-            SELECT table_name FROM information_schema.tables
-            WHERE table_schema = 'main'
-        """).fetchall()
 
         required_tables = ['dex_usage_hourly', 'dex_usage_daily', 'dex_usage_total', 'etl_run_log']
-        table_names = [t[0] for t in tables]
+
+        # Only held for the two queries, and closed even if one fails, so
+        # the read-only lock never outlives the check
+        with duckdb.connect(str(db_path), read_only=True) as conn:
+            # Check tables
+            tables = conn.execute("""
+                SELECT table_name FROM information_schema.tables
+                WHERE table_schema = 'main'
+            """).fetchall()
+            table_names = {t[0] for t in tables}
+
+            # Count rows of every table that exists in a single query
+            present = [table for table in required_tables if table in table_names]
+            counts = {}
+            if present:
+                counts = dict(conn.execute(" UNION ALL ".join(
+                    f"SELECT '{table}' AS table_name, COUNT(*) AS row_count FROM {table}" for table in present
+                )).fetchall())
 
         for table in required_tables:
-            if table in table_names:
-                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
-                print(f"  {GREEN}✓ {table} ({count} rows){RESET}")
+            if table in counts:
+                print(f"  {GREEN}✓ {table} ({counts[table]} rows){RESET}", file=out)
             else:
-                print(f"  {RED}✗ Table missing: {table}{RESET}")
-                conn.close()
+                print(f"  {RED}✗ Table missing: {table}{RESET}", file=out)
                 return False
 
-        conn.close()
         return True
 
     except Exception as e:
-        print(f"  {RED}✗ Database error: {e}{RESET}")
+        print(f"  {RED}✗ Database error: {e}{RESET}", file=out)
         return False
 
 
-def check_parquet_access():
+def count_parquet_files(date_path):
+    """
+    Count the parquet files of one chain/day
+
+    Args:
+        date_path: .../chain=<chain>/date=<YYYY-MM-DD> directory
+
+    Returns:
+        Number of */*.parquet files under its hour=* directories (the layout
+        the ETL reads), or -1 if date_path doesn't exist
+    """
+    # One scandir per directory; the file type comes with each entry, and a
+    # missing directory is reported by scandir itself rather than a stat
+    try:
+        with os.scandir(date_path) as entries:
+            hour_dirs = [entry.path for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return -1
+
+    files = 0
+    for hour_dir in hour_dirs:
+        with os.scandir(hour_dir) as entries:
+            files += sum(1 for entry in entries if entry.name.endswith('.parquet'))
+    return files
+
+
+def check_parquet_access(out=sys.stdout):
     """Check if parquet files are accessible"""
-    print(f"\n{BLUE}[6/8] Checking parquet file access...{RESET}")
+    print(f"\n{BLUE}[6/8] Checking parquet file access...{RESET}", file=out)
 
-    import yaml
-    from datetime import datetime, timedelta
+    from datetime import datetime, timedelta, timezone
 
-    config_path = Path(__file__).parent.parent / "config" / "config.yaml"
-    with open(config_path) as f:
-        config = yaml.safe_load(f)
+    config = load_config()
 
     parquet_base = config['data']['parquet_base_path']
 
     # Check if base path exists
     if not os.path.exists(parquet_base):
-        print(f"  {RED}✗ Parquet base path not found: {parquet_base}{RESET}")
-        print(f"  {YELLOW}  Update 'data.parquet_base_path' in config.yaml{RESET}")
+        print(f"  {RED}✗ Parquet base path not found: {parquet_base}{RESET}", file=out)
+        print(f"  {YELLOW}  Update 'data.parquet_base_path' in config.yaml{RESET}", file=out)
         return False
 
-    print(f"  {GREEN}✓ Base path exists: {parquet_base}{RESET}")
+    print(f"  {GREEN}✓ Base path exists: {parquet_base}{RESET}", file=out)
 
     # Check for recent data
-    yesterday = (datetime.utcnow() - timedelta(days=1)).strftime("%Y-%m-%d")
+    yesterday = (datetime.now(timezone.utc).date() - timedelta(days=1)).isoformat()
     found_any = False
 
     for chain in config['chains']:
         chain_path = f"{parquet_base}/chain={chain}/date={yesterday}"
-        if os.path.exists(chain_path):
-            files = len([f for f in os.listdir(chain_path) if f.endswith('.parquet')])
-            if files > 0:
-                print(f"  {GREEN}✓ {chain}: {files} file(s) for {yesterday}{RESET}")
-                found_any = True
-            else:
-                print(f"  {YELLOW}⚠ {chain}: No parquet files for {yesterday}{RESET}")
+        files = count_parquet_files(chain_path)
+        if files > 0:
+            print(f"  {GREEN}✓ {chain}: {files} file(s) for {yesterday}{RESET}", file=out)
+            found_any = True
+        elif files == 0:
+            print(f"  {YELLOW}⚠ {chain}: No parquet files for {yesterday}{RESET}", file=out)
         else:
-            print(f"  {YELLOW}⚠ {chain}: Path not found for {yesterday}{RESET}")
+            print(f"  {YELLOW}⚠ {chain}: Path not found for {yesterday}{RESET}", file=out)
 
     if not found_any:
-        print(f"\n  {YELLOW}⚠ No recent parquet data found{RESET}")
-        print(f"  {YELLOW}  This may be normal if data hasn't been generated yet{RESET}")
+        print(f"\n  {YELLOW}⚠ No recent parquet data found{RESET}", file=out)
+        print(f"  {YELLOW}  This may be normal if data hasn't been generated yet{RESET}", file=out)
 
     return True
 
 
-def check_scripts():
+def check_scripts(out=sys.stdout):
     """Check if scripts are executable"""
-    print(f"\n{BLUE}[7/8] Checking scripts...{RESET}")
+    print(f"\n{BLUE}[7/8] Checking scripts...{RESET}", file=out)
     base_path = Path(__file__).parent
     scripts = ['init_database.py', 'daily_etl.py', 'generate_report.py', 'setup_cron.sh']
 
+    # One directory listing instead of a stat per name
+    with os.scandir(base_path) as entries:
+        present = {entry.name: entry for entry in entries}
+
     all_good = True
     for script in scripts:
-        script_path = base_path / script
-        if script_path.exists():
-            is_executable = os.access(script_path, os.X_OK)
+        if script in present:
+            is_executable = present[script].stat().st_mode & 0o111
             if is_executable or script.endswith('.py'):
-                print(f"  {GREEN}✓ {script}{RESET}")
+                print(f"  {GREEN}✓ {script}{RESET}", file=out)
             else:
-                print(f"  {YELLOW}⚠ {script} (not executable){RESET}")
-                print(f"    Run: chmod +x scripts/{script}")
+                print(f"  {YELLOW}⚠ {script} (not executable){RESET}", file=out)
+                print(f"    Run: chmod +x scripts/{script}", file=out)
         else:
-            print(f"  {RED}✗ {script} not found{RESET}")
+            print(f"  {RED}✗ {script} not found{RESET}", file=out)
             all_good = False
 
     return all_good
 
 
-def check_utils():
+def check_utils(out=sys.stdout):
     """Check if utils module is importable"""
-    print(f"\n{BLUE}[8/8] Checking utils module...{RESET}")
+    print(f"\n{BLUE}[8/8] Checking utils module...{RESET}", file=out)
 
     try:
         from utils import get_parquet_files, generate_union_sql_from_parquet
-        print(f"  {GREEN}✓ utils module imported successfully{RESET}")
-        print(f"  {GREEN}✓ get_parquet_files available{RESET}")
-        print(f"  {GREEN}✓ generate_union_sql_from_parquet available{RESET}")
+        print(f"  {GREEN}✓ utils module imported successfully{RESET}", file=out)
+        print(f"  {GREEN}✓ get_parquet_files available{RESET}", file=out)
+        print(f"  {GREEN}✓ generate_union_sql_from_parquet available{RESET}", file=out)
         return True
     except Exception as e:
-        print(f"  {RED}✗ Error importing utils: {e}{RESET}")
+        print(f"  {RED}✗ Error importing utils: {e}{RESET}", file=out)
         return False
 
 
+def run_check(check):
+    """
+    Run one check with its output buffered
+
+    Returns:
+        Tuple of (passed, printed output)
+    """
+    out = io.StringIO()
+    try:
+        result = check(out)
+    except Exception as e:
+        print(f"  {RED}✗ Unexpected error: {e}{RESET}", file=out)
+        result = False
+    return result, out.getvalue()
+
+
 def main():
     """Run all checks"""
     print(f"\n{BLUE}{'='*60}{RESET}")
@@ -251,14 +320,13 @@ def main():
         check_utils
     ]
 
+    # The checks are independent and mostly wait on the filesystem or
+    # DuckDB, so they run concurrently; output is still written in order
     results = []
-    for check in checks:
-        try:
-            result = check()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for result, output in executor.map(run_check, checks):
+            sys.stdout.write(output)
             results.append(result)
-        except Exception as e:
-            print(f"  {RED}✗ Unexpected error: {e}{RESET}")
-            results.append(False)
 
     # Summary
     print(f"\n{BLUE}{'='*60}{RESET}")
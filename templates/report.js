@@ -0,0 +1,316 @@
+// Per-chain data (see build_payload), parsed on first use. Blocks
+// marked data-encoding="gzip" hold base64 gzip (report.compress_data);
+// blocks with data-src are fetched from that file (report.shard_data)
+const chainCache = new Map();
+const chainLoads = new Map();
+const emptyChain = { dexes: [], daily: {}, hourly: {}, total: [], ranking: { dex: [], values: [] }, stats: {} };
+
+async function inflate(b64) {
+    const bytes = Uint8Array.from(atob(b64), c => c.charCodeAt(0));
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+    return JSON.parse(await new Response(stream).text());
+}
+
+async function readChainBlock(chain) {
+    const block = document.getElementById(`data-${chain}`);
+    if (!block) return emptyChain;
+    if (block.dataset.src) {
+        const response = await fetch(block.dataset.src);
+        if (!response.ok) {
+            console.error(`Failed to load ${block.dataset.src}: ${response.status}`);
+            return emptyChain;
+        }
+        return response.json();
+    }
+    if (block.dataset.encoding === 'gzip') return inflate(block.textContent);
+    return JSON.parse(block.textContent);
+}
+
+function loadChain(chain) {
+    if (!chainLoads.has(chain)) {
+        chainLoads.set(chain, readChainBlock(chain).then(data => { chainCache.set(chain, data); }));
+    }
+    return chainLoads.get(chain);
+}
+
+// Only valid once loadChain(chain) has resolved
+function chainData(chain) {
+    return chainCache.get(chain) || emptyChain;
+}
+
+// Dates with daily data on any chain
+const availableDates = JSON.parse(document.getElementById('available-dates').textContent);
+
+// Populate date select
+const dateSelect = document.getElementById('dateSelect');
+availableDates.forEach(date => {
+    const option = document.createElement('option');
+    option.value = date;
+    option.textContent = date;
+    dateSelect.appendChild(option);
+});
+
+// Color palette
+const colors = ['#667eea', '#764ba2', '#f093fb', '#4facfe', '#43e97b', '#fa709a', '#fee140', '#30cfd0', '#ff6b6b', '#4ecdc4'];
+
+// Dates shown for a selection: every date for 'all', otherwise just the one picked
+function selectedDates(byDate, date) {
+    if (date === 'all') return Object.keys(byDate).sort();
+    return byDate[date] ? [date] : [];
+}
+
+function dailyGroups(chain, date) {
+    const daily = chainData(chain).daily;
+    return selectedDates(daily, date).map(d => [d, daily[d]]);
+}
+
+function hourlyGroups(chain, date) {
+    const hourly = chainData(chain).hourly;
+    return selectedDates(hourly, date).flatMap(d =>
+        Object.keys(hourly[d]).map(h => [`${d} ${String(h).padStart(2, '0')}:00`, hourly[d][h]])
+    );
+}
+
+// Turn [[label, [[dexIdx, usage], ...]], ...] into one usage series per DEX
+// (a row of a dexCount x labelCount Float64Array, zero where missing) plus
+// per-label totals, keeping DEXes in order of first appearance
+function pivot(groups, dexes) {
+    const labels = groups.map(([label]) => label);
+    const n = labels.length;
+    const grid = new Float64Array(dexes.length * n);
+    const totals = new Float64Array(n);
+    const firstSeen = new Set();
+    groups.forEach(([, rows], i) => {
+        for (const [dexIdx, usage] of rows) {
+            firstSeen.add(dexIdx);
+            grid[dexIdx * n + i] = usage;
+            totals[i] += usage;
+        }
+    });
+    const order = [...firstSeen];
+    return {
+        labels,
+        totals,
+        dexNames: order.map(dexIdx => dexes[dexIdx]),
+        series: order.map(dexIdx => grid.subarray(dexIdx * n, (dexIdx + 1) * n))
+    };
+}
+
+// Pivots are built once per (view, chain, date) and shared by every
+// chart drawing that selection, including on later re-selection
+const pivotCache = new Map();
+
+function cachedPivot(view, chain, date) {
+    const key = `${view}|${chain}|${date}`;
+    if (!pivotCache.has(key)) {
+        const groups = view === 'daily' ? dailyGroups(chain, date) : hourlyGroups(chain, date);
+        pivotCache.set(key, pivot(groups, chainData(chain).dexes));
+    }
+    return pivotCache.get(key);
+}
+
+function updateStats(chain, date) {
+    const statsGrid = document.getElementById('statsGrid');
+
+    // Totals are computed in DuckDB; keyed by date, or 'all' for all-time
+    const stats = chainData(chain).stats[date];
+    if (!stats) {
+        statsGrid.innerHTML = '';
+        return;
+    }
+
+    const [totalUsage, totalOrders, dexCount] = stats;
+
+    if (date === 'all') {
+        // Show total aggregated data
+        statsGrid.innerHTML = `
+            <div class="stat-card">
+                <div class="stat-label">Total Usage</div>
+                <div class="stat-value">${totalUsage.toLocaleString()}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Unique Orders</div>
+                <div class="stat-value">${totalOrders.toLocaleString()}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Active DEXes</div>
+                <div class="stat-value">${dexCount}</div>
+            </div>
+        `;
+    } else {
+        // Show data for specific date
+        statsGrid.innerHTML = `
+            <div class="stat-card">
+                <div class="stat-label">Usage ({date})</div>
+                <div class="stat-value">${totalUsage.toLocaleString()}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Orders ({date})</div>
+                <div class="stat-value">${totalOrders.toLocaleString()}</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-label">Active DEXes</div>
+                <div class="stat-value">${dexCount}</div>
+            </div>
+        `;
+    }
+}
+
+// Chart 1: 按天统计柱状图
+function createChart1(chain, date) {
+    const { labels: dates, series, dexNames } = cachedPivot('daily', chain, date);
+    if (dates.length === 0) {
+        document.getElementById('chart1').innerHTML = '<div class="loading">No data available</div>';
+        return;
+    }
+
+    const traces = dexNames.map((dex, idx) => ({
+        x: dates,
+        y: series[idx],
+        name: dex,
+        type: 'bar',
+        marker: { color: colors[idx % colors.length] }
+    }));
+
+    const layout = {
+        height: 500,
+        barmode: 'stack',
+        xaxis: { title: '日期' },
+        yaxis: { title: '使用次数' },
+        margin: { t: 20, b: 60, l: 60, r: 20 }
+    };
+
+    Plotly.newPlot('chart1', traces, layout, {responsive: true});
+}
+
+// Chart 2: 按天统计百分比图
+function createChart2(chain, date) {
+    const { labels: dates, series, totals, dexNames } = cachedPivot('daily', chain, date);
+    if (dates.length === 0) {
+        document.getElementById('chart2').innerHTML = '<div class="loading">No data available</div>';
+        return;
+    }
+
+    const traces = dexNames.map((dex, idx) => ({
+        x: dates,
+        y: series[idx].map((usage, i) => usage / totals[i] * 100),
+        name: dex,
+        type: 'bar',
+        marker: { color: colors[idx % colors.length] }
+    }));
+
+    const layout = {
+        height: 500,
+        barmode: 'stack',
+        xaxis: { title: '日期' },
+        yaxis: { title: '百分比 (%)', ticksuffix: '%' },
+        margin: { t: 20, b: 60, l: 60, r: 20 }
+    };
+
+    Plotly.newPlot('chart2', traces, layout, {responsive: true});
+}
+
+// Chart 3: 按小时统计
+function createChart3(chain, date) {
+    const { labels: hours, series, dexNames } = cachedPivot('hourly', chain, date);
+    if (hours.length === 0) {
+        document.getElementById('chart3').innerHTML = '<div class="loading">No data available</div>';
+        return;
+    }
+
+    const traces = dexNames.map((dex, idx) => ({
+        x: hours,
+        y: series[idx],
+        name: dex,
+        type: 'bar',
+        marker: { color: colors[idx % colors.length] }
+    }));
+
+    const layout = {
+        height: 500,
+        barmode: 'stack',
+        xaxis: { title: '时间', tickangle: 45 },
+        yaxis: { title: '使用次数' },
+        margin: { t: 20, b: 100, l: 60, r: 20 }
+    };
+
+    Plotly.newPlot('chart3', traces, layout, {responsive: true});
+}
+
+// Chart 4: 饼图
+function createChart4(chain) {
+    const { total: data, dexes } = chainData(chain);
+    if (data.length === 0) {
+        document.getElementById('chart4').innerHTML = '<div class="loading">No data available</div>';
+        return;
+    }
+
+    const trace = {
+        labels: data.map(d => dexes[d[0]]),
+        values: data.map(d => d[1]),
+        type: 'pie',
+        marker: { colors: colors },
+        textposition: 'inside',
+        textinfo: 'label+percent',
+        hovertemplate: '<b>%{label}</b><br>Usage: %{value}<br>Percentage: %{percent}<extra></extra>'
+    };
+
+    const layout = {
+        height: 500,
+        margin: { t: 20, b: 20, l: 20, r: 20 },
+        showlegend: true
+    };
+
+    Plotly.newPlot('chart4', [trace], layout, {responsive: true});
+}
+
+// Chart 5: 排行榜
+function createChart5(chain) {
+    const { ranking, dexes } = chainData(chain);
+    if (ranking.dex.length === 0) {
+        document.getElementById('chart5').innerHTML = '<div class="loading">No data available</div>';
+        return;
+    }
+
+    const trace = {
+        x: ranking.values,
+        y: ranking.dex.map(i => dexes[i]),
+        type: 'bar',
+        orientation: 'h',
+        marker: { color: '#667eea' },
+        text: ranking.values.map(v => v.toLocaleString()),
+        textposition: 'outside'
+    };
+
+    const layout = {
+        height: 500,
+        xaxis: { title: '使用次数' },
+        margin: { t: 20, b: 40, l: 150, r: 40 }
+    };
+
+    Plotly.newPlot('chart5', [trace], layout, {responsive: true});
+}
+
+async function updateCharts() {
+    const chainSelect = document.getElementById('chainSelect');
+    const chain = chainSelect.value;
+    const date = dateSelect.value;
+
+    await loadChain(chain);
+    // The selection may have changed while the chain was loading
+    if (chainSelect.value !== chain || dateSelect.value !== date) return;
+
+    updateStats(chain, date);
+    createChart1(chain, date);
+    createChart2(chain, date);
+    createChart3(chain, date);
+    createChart4(chain);
+    createChart5(chain);
+}
+
+// Event listeners
+document.getElementById('chainSelect').addEventListener('change', updateCharts);
+document.getElementById('dateSelect').addEventListener('change', updateCharts);
+
+// Initial load
+updateCharts();
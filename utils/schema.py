@@ -0,0 +1,19 @@
+"""
+Table definitions shared by the database setup and the ETL
+"""
+
+# Raw swap rows ingested from parquet (native storage for re-aggregation).
+# The ETL also runs this on start, so databases created before the table
+# existed pick it up without a re-init.
+DEX_RAW_DDL = """
+    CREATE TABLE IF NOT EXISTS dex_raw (
+        chain_id VARCHAR NOT NULL,
+        date DATE NOT NULL,
+        hour UTINYINT NOT NULL,
+        orderId VARCHAR,
+        inputToken VARCHAR,
+        outputToken VARCHAR,
+        request VARCHAR,
+        source_file VARCHAR NOT NULL
+    )
+"""
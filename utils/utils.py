@@ -3,28 +3,35 @@ Utility functions for DEX data processing
 Originally from the Jupyter notebook
 """
 from datetime import datetime, timedelta
+from functools import lru_cache
+import io
 import base64
-from IPython.display import HTML
 
 
+@lru_cache(maxsize=256)
 def get_parquet_files(chain_id, begin_time, end_time):
     """
     Get parquet file paths for a specific chain and time range
 
+    Results are cached, so repeated calls for the same range are free.
+
     Args:
         chain_id: Chain identifier (bsc, eth, base, sol)
-        begin_time: Start time in format "YYYY-MM-DD HH:MM:SS"
-        end_time: End time in format "YYYY-MM-DD HH:MM:SS"
+        begin_time: Start time as a datetime or in format "YYYY-MM-DD HH:MM:SS"
+        end_time: End time as a datetime or in format "YYYY-MM-DD HH:MM:SS"
 
     Returns:
-        List of parquet file paths
+        Tuple of parquet file paths
     """
     base_files = get_files_for_suffix(begin_time, end_time, ".parquet")
-    chain_files = []
-    for filename in base_files:
-        chain_file_path = f'/server/data/parquet/chain={chain_id}/{filename}'
-        chain_files.append(chain_file_path)
-    return chain_files
+    return tuple(f'/server/data/parquet/chain={chain_id}/{filename}' for filename in base_files)
+
+
+# Time grouping expressions for chose_period (anything but 'hour' is daily)
+_PERIOD_SQL = {
+    "hour": "DATE_TRUNC('hour', CAST(BlockTime AS TIMESTAMP))",
+    "day": "DATE_TRUNC('day', CAST(BlockTime AS TIMESTAMP))",
+}
 
 
 def chose_period(groupBy):
@@ -37,10 +44,7 @@ def chose_period(groupBy):
     Returns:
         SQL date truncation expression
     """
-    if groupBy == "hour":
-        return "DATE_TRUNC('hour', CAST(BlockTime AS TIMESTAMP))"
-    else:
-        return "DATE_TRUNC('day', CAST(BlockTime AS TIMESTAMP))"
+    return _PERIOD_SQL.get(groupBy, _PERIOD_SQL["day"])
 
 
 def generate_union_sql_from_parquet(file_paths):
@@ -70,42 +74,52 @@ def generate_union_sql(file_paths, file_format):
     if not file_paths:
         raise ValueError("文件路径数组不能为空")
 
-    select_statements = []
-    for file_path in file_paths:
-        select_statements.append(f'SELECT * FROM read_{file_format}("{file_path}")')
+    # Everything but the path is the same for each file, so format it once
+    prefix = f'SELECT * FROM read_{file_format}("'
+    suffix = '")'
+    if len(file_paths) == 1:
+        return prefix + file_paths[0] + suffix
+    return ' UNION ALL '.join(prefix + file_path + suffix for file_path in file_paths)
 
-    union_sql = ' UNION ALL '.join(select_statements)
-    return union_sql
+
+def _to_datetime(value):
+    """Accept a datetime as-is, otherwise parse "YYYY-MM-DD HH:MM:SS" """
+    if isinstance(value, datetime):
+        return value
+    # fromisoformat is C-implemented; strptime only runs to produce the
+    # "time data ..." error for input it rejects
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
 
 
+@lru_cache(maxsize=256)
 def get_files_for_suffix(begin_time, end_time, suffix):
     """
     Get file patterns for date range with specific suffix
 
+    Results are cached; every chain of a day shares the same patterns.
+
     Args:
-        begin_time: Start time in format "YYYY-MM-DD HH:MM:SS"
-        end_time: End time in format "YYYY-MM-DD HH:MM:SS"
+        begin_time: Start time as a datetime or in format "YYYY-MM-DD HH:MM:SS"
+        end_time: End time as a datetime or in format "YYYY-MM-DD HH:MM:SS"
         suffix: File suffix (e.g., ".parquet")
 
     Returns:
-        List of file path patterns
+        Tuple of file path patterns
     """
     try:
-        start_date = datetime.strptime(begin_time, "%Y-%m-%d %H:%M:%S")
-        end_date = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S")
+        start_date = _to_datetime(begin_time)
+        end_date = _to_datetime(end_time)
 
         if start_date > end_date:
             raise ValueError("开始时间不能晚于结束时间")
 
-        file_list = []
-        current_date = start_date
-
-        while current_date <= end_date:
-            file_name = current_date.strftime(f"date=%Y-%m-%d/hour=*/*{suffix}")
-            file_list.append(file_name)
-            current_date += timedelta(days=1)
-
-        return file_list
+        # One pattern per day from start_date while <= end_date
+        n_days = (end_date - start_date) // timedelta(days=1) + 1
+        fmt = f"date=%Y-%m-%d/hour=*/*{suffix}"
+        return tuple((start_date + timedelta(days=i)).strftime(fmt) for i in range(n_days))
 
     except ValueError as e:
         if "time data" in str(e):
@@ -126,7 +140,12 @@ def create_download_link(df, filename="data.csv", title="下载CSV文件"):
     Returns:
         IPython HTML object with download link
     """
-    csv_string = df.to_csv(index=False, encoding='utf-8')
-    b64 = base64.b64encode(csv_string.encode('utf-8')).decode()
+    # Imported here so the ETL scripts don't pay for IPython on import
+    from IPython.display import HTML
+
+    # Write the CSV straight to bytes instead of a str that is then encoded
+    buf = io.BytesIO()
+    df.to_csv(buf, index=False, encoding='utf-8')
+    b64 = base64.b64encode(buf.getbuffer()).decode('ascii')
     href = f'<a href="data:file/csv;base64,{b64}" download="{filename}" target="_blank">{title}</a>'
     return HTML(href)